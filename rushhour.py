@@ -1,77 +1,585 @@
+from bisect import bisect_left
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
+from multiprocessing import shared_memory
 import copy
+import hashlib
+import heapq
+import json
+import mmap
+import os
 import queue
+import shutil
+import struct
+import sys
+import tempfile
+import time
 
 # Main function (can also just call best_first_search func)
-def rushhour(heuristic, start):
-    best_first_search(heuristic, start)
+# Returns: (path, memory tracker) from best_first_search
+def rushhour(heuristic, start, memory_cap=None, distance_table=None, monitor=None, exit_pos=None,
+             partial_expansion=False):
+    return best_first_search(heuristic, start, memory_cap, distance_table, monitor, exit_pos, partial_expansion)
 
 # Best First Search Function
-# Arguments: User input for heuristic and start state
-def best_first_search(heuristic, start):
+# Arguments: User input for heuristic and start state, optional memory cap in bytes (see MemoryTracker),
+# optional DistanceTable of exact distances to use instead of the heuristic where it has the board,
+# optional ProgressMonitor for progress snapshots and cancellation, optional exit (row, column)
+# (the start state can be any size x size board, see Board).
+# When X has a clear path to the exit, the goal reached by driving it out costs the depth plus the drive. It
+# is returned right away if no state in the frontier has a lower priority, else it goes into the frontier
+# with that cost as its priority and is returned when it is popped (see lowest_priority).
+# With partial_expansion set, expanding a state only puts the children whose priority is not above the
+# state's stored priority into the frontier. If any children were left out, the state goes back into the
+# frontier with the smallest priority among them and puts those in when it is popped again. A held back
+# child can be reached through another state at a greater depth first; when the held back copy is generated
+# again, the frontier board is moved onto the shorter path (see Board.generate_new_states), so the states
+# are expanded as without partial expansion.
+# Returns: (path, memory tracker): the path is a list of boards from the start to a goal, [] if there is no
+# solution or None if the search was cancelled, and the MemoryTracker holds the peak nodes and bytes
+def best_first_search(heuristic, start, memory_cap=None, distance_table=None, monitor=None, exit_pos=None,
+                      partial_expansion=False):
     frontier = queue.PriorityQueue()    # list of unexplored states, sorted in a priority queue
     explored_states = []                # list of explored states to not explore again
     states_in_frontier = []             # list of states in frontier to not explored if a duplicate is encountered
     depth = 0
 
     board = Board(heuristic)
-    create_all_vehicles(start, board, depth)    # convert the start state into vehicle objs and store in board obj
+    board.distance_table = distance_table
+    # convert the start state into vehicle objs and store in board obj
+    create_all_vehicles(start, board, depth, exit_pos)
     frontier.put(board)
+    insertions = 1                      # order given to the next state put in the frontier
+    memory = MemoryTracker(cap=memory_cap, node_bytes=estimate_board_bytes(board),
+                           encoding_bytes=sys.getsizeof(board.encode_state()) + 32)    # + set slot
+    if monitor is None:
+        monitor = ProgressMonitor()
+    monitor.start()
 
     while not frontier.empty():
         curr_state = frontier.get()             # pop the first state and add to the explored states
-        explored_states.append(curr_state)
+        if curr_state.expanded_f is None:       # states put back by partial expansion are already explored
+            explored_states.append(curr_state)
         if curr_state in states_in_frontier:
             states_in_frontier.remove(curr_state)   # remove this states from states_in_frontier
+        if monitor.expanded(curr_state, frontier.qsize()):
+            print("Search cancelled")           # frontier and explored states are freed when we return
+            print("Total states explored: ", len(explored_states) + memory.dropped_states)
+            return None, memory
 
-        if is_goal_state(curr_state):           # if goal state is reached, print out the path
-            path = trace_path(curr_state)
-            for state in path:
-                state.print_state()
-            print("Total moves: ", len(path) - 1)
-            print("Total states explored: ", len(explored_states))
-            return
-        else:
-            new_states = curr_state.generate_new_states(explored_states, states_in_frontier) # generate children
-            for state in new_states:
-                frontier.put(state)                 # put new states into frontier
+        # no solution that is not found yet can cost less than the priority of the popped state
+        lowest_f = curr_state.priority
+        goal_state = clear_path_to_goal(curr_state) # if X can drive straight out, no expansion needed
+        if goal_state is not None:
+            if goal_state.depth <= lowest_priority(frontier, lowest_f):
+                monitor.finish('solved', frontier.qsize())
+                return print_solution(goal_state, explored_states, memory), memory
+            goal_state.priority = goal_state.depth  # a cheaper solution may still exist, wait for it
+            goal_state.order = insertions
+            insertions += 1
+            frontier.put(goal_state)
+            memory.update(explored_states, frontier)
+            continue
+        # children are generated lazily, so the search stops as soon as one of them reaches the cheapest goal
+        next_f = None   # smallest priority of the children left out by partial expansion
+        for state in curr_state.generate_new_states(explored_states, states_in_frontier, frontier=frontier):
+            if partial_expansion:
+                if state.priority > curr_state.priority:
+                    if next_f is None or state.priority < next_f:
+                        next_f = state.priority
+                    continue
+                if curr_state.expanded_f is not None and state.priority <= curr_state.expanded_f:
+                    continue                    # already put in the frontier by an earlier expansion
+            if memory.was_dropped(state):       # explored before and dropped to stay under the memory cap
+                continue
+            goal_state = clear_path_to_goal(state)
+            if goal_state is not None:
+                if goal_state.depth <= lowest_priority(frontier, lowest_f):
+                    monitor.finish('solved', frontier.qsize())
+                    return print_solution(goal_state, explored_states, memory), memory
+                goal_state.priority = goal_state.depth
+                state = goal_state              # put the goal in the frontier instead of the state
+            state.order = insertions
+            insertions += 1
+            frontier.put(state)                 # put new states into frontier
+            if goal_state is None:
                 states_in_frontier.append(state)    # also put in states_in_frontier
+        if next_f is not None:                  # put the state back to add the rest of its children later
+            curr_state.expanded_f = curr_state.priority
+            curr_state.priority = next_f
+            frontier.put(curr_state)
+        memory.update(explored_states, frontier)
 
+    monitor.finish('no solution', 0)
     print("Total moves: ", 0)                       # if the frontier is empty, that means a goal state is not possible
-    print("Total states explored: ", len(explored_states))
-    return []
+    print("Total states explored: ", len(explored_states) + memory.dropped_states)
+    memory.print_usage()
+    return [], memory
+
+
+# Progress Monitor Class
+# Description: Reports on a running search and lets a controller stop it. Every check_every expansions it
+# checks the cancel token (anything with an is_set() method, like threading.Event) and, if interval seconds
+# have passed since the last one, sends a progress snapshot (a dict) to the callback and/or writes it as a
+# JSON line to the stream. Snapshots hold the states expanded, nodes per second, frontier size, the f of the
+# state expanded last and the highest f expanded so far (A* pops f in nondecreasing order, so this is the
+# f-bound the search has reached), the best (lowest) f and h seen, the elapsed time and the status
+# ('running', 'solved', 'no solution', 'cancelled').
+@dataclass
+class ProgressMonitor:
+    callback: object = None     # called with each snapshot
+    stream: object = None       # file object that gets each snapshot as a JSON line
+    interval: float = 1.0       # seconds between snapshots
+    cancel: object = None       # cancellation token, checked every check_every expansions
+    check_every: int = 100
+    expansions: int = 0
+    current_f: int = None       # f of the state expanded last
+    max_f: int = None           # highest f expanded so far
+    best_f: int = None
+    best_h: int = None
+    start_time: float = 0.0
+    last_report: float = 0.0
+
+    # Description: Resets the counters at the start of a search
+    def start(self):
+        self.expansions = 0
+        self.current_f = None
+        self.max_f = None
+        self.best_f = None
+        self.best_h = None
+        self.start_time = self.last_report = time.monotonic()
+
+    # Description: Records the expansion of a state, reports progress if it is time to
+    # Arguments: Expanded state: Board, Frontier size: int
+    # Returns: True if the search should be cancelled, else False
+    def expanded(self, state, frontier_size):
+        self.expansions += 1
+        h = state.priority - state.depth if state.priority else 0
+        self.current_f = state.priority
+        if self.max_f is None or state.priority > self.max_f:
+            self.max_f = state.priority
+        if self.best_f is None or state.priority < self.best_f:
+            self.best_f = state.priority
+        if self.best_h is None or h < self.best_h:
+            self.best_h = h
+        if self.expansions % self.check_every:
+            return False
+        if self.cancel is not None and self.cancel.is_set():
+            self.finish('cancelled', frontier_size)
+            return True
+        if time.monotonic() - self.last_report >= self.interval:
+            self.report('running', frontier_size)
+        return False
+
+    # Description: Sends a final snapshot when the search ends
+    # Arguments: Status: string, Frontier size: int
+    def finish(self, status, frontier_size):
+        self.report(status, frontier_size)
+
+    # Description: Builds a snapshot and sends it to the callback and stream
+    # Arguments: Status: string, Frontier size: int
+    def report(self, status, frontier_size):
+        if self.callback is None and self.stream is None:
+            return
+        now = time.monotonic()
+        self.last_report = now
+        elapsed = now - self.start_time
+        snapshot = {
+            'status': status,
+            'expanded': self.expansions,
+            'nodes_per_sec': self.expansions / elapsed if elapsed > 0 else 0.0,
+            'frontier': frontier_size,
+            'f': self.current_f,
+            'max_f': self.max_f,
+            'best_f': self.best_f,
+            'best_h': self.best_h,
+            'elapsed': elapsed,
+        }
+        if self.callback is not None:
+            self.callback(snapshot)
+        if self.stream is not None:
+            self.stream.write(json.dumps(snapshot) + '\n')
+            self.stream.flush()
+
+
+# Beam Search Function
+# Description: Fast search for when an optimal answer is not needed. At each depth the children of every
+# state in the beam are generated, duplicates are removed (within the new layer and against the last two
+# layers, since a move can be undone), and only the beam_width best children by heuristic are kept.
+# Memory and time per depth are bounded by beam_width, but the solution found may not be optimal, and a
+# puzzle can be reported as unsolved if the beam dropped every path to the goal.
+# Arguments: User input for heuristic, start state, beam width: int, max depth: int, exit (row, column)
+def beam_search(heuristic, start, beam_width=100, max_depth=200, exit_pos=None):
+    board = Board(heuristic)
+    create_all_vehicles(start, board, 0, exit_pos)
+    beam = [board]
+    prev_layer = set()
+    curr_layer = {board.encode_state()}
+    states_explored = 0
+    depth = 0
+
+    goal_state = clear_path_to_goal(board)
+    while goal_state is None and beam and depth < max_depth:
+        depth += 1
+        children = []
+        next_layer = set()
+        for state in beam:
+            states_explored += 1
+            # no move pruning: the beam may drop the board the other move order goes through
+            for child in state.generate_new_states([], [], prune_moves=False):
+                goal_state = clear_path_to_goal(child)
+                if goal_state is not None:
+                    break
+                encoding = child.encode_state()
+                if encoding in next_layer or encoding in curr_layer or encoding in prev_layer:
+                    continue
+                next_layer.add(encoding)
+                children.append(child)
+            if goal_state is not None:
+                break
+        beam = heapq.nsmallest(beam_width, children)   # keep the best-k children by priority
+        prev_layer, curr_layer = curr_layer, {state.encode_state() for state in beam}
+
+    if goal_state is None:                      # the beam ran out before a goal state was found
+        print("Total moves: ", 0)
+        print("Total states explored: ", states_explored)
+        print("Beam search (width " + str(beam_width) + "): no solution found, puzzle may still be solvable")
+        return []
+    path = trace_path(goal_state)
+    for state in path:
+        state.print_state()
+    print("Total moves: ", len(path) - 1)
+    print("Total states explored: ", states_explored)
+    print("Beam search (width " + str(beam_width) + "): solution may not be optimal")
+    return path
+
+
+# Memory Tracker Class
+# Description: Keeps track of the boards the search holds (explored states and frontier) and an approximate
+# byte count for them. If a memory cap (bytes) is given and the search goes over it, explored boards that
+# no frontier board descends from (dead ends and other leaves, highest priority first) are dropped until
+# usage is back to 3/4 of the cap. Nothing links to those boards, so dropping them really frees them, while
+# the boards on the path of a frontier board are always kept (so the explored list is never emptied). Each
+# dropped board is remembered as its packed encoding (see Board.encode_state), a few bytes instead of a
+# whole board, so it is still recognized if it is generated again and every state is expanded at most once.
+# If the frontier and the paths to it alone are over the cap, a trim cannot get back to 3/4 of it, so the
+# next trim waits until usage has grown by another 1/4 past what that trim reached.
+# A state put back by partial expansion is in both the explored list and the frontier but is only counted
+# once. The peak reported (and returned with the path by best_first_search) is the peak of what is kept
+# after trimming.
+@dataclass
+class MemoryTracker:
+    cap: int = None             # memory cap in bytes, None for no cap
+    node_bytes: int = 0         # approximate size of one board in bytes
+    encoding_bytes: int = 0     # approximate size of one dropped board's encoding in the dropped set
+    live_nodes: int = 0
+    peak_nodes: int = 0
+    peak_memory: int = 0
+    dropped_states: int = 0
+    next_trim: int = 0          # usage (bytes) that triggers the next trim if above the cap
+    dropped: set = field(default_factory=set)
+
+    # Description: Recounts the boards held by the search and trims the explored states if over the cap
+    # Arguments: Explored states: list, Frontier: PriorityQueue
+    def update(self, explored_states, frontier):
+        if self.cap is not None:
+            if self.current_bytes(explored_states, frontier) > max(self.cap, self.next_trim):
+                self.trim(explored_states, frontier)
+        self.live_nodes = self.held_nodes(explored_states, frontier)
+        self.peak_nodes = max(self.peak_nodes, self.live_nodes)
+        self.peak_memory = max(self.peak_memory, self.current_bytes(explored_states, frontier))
+
+    # Description: Counts the boards held by the explored states and the frontier, counting the states put
+    # back by partial expansion (already in the explored list) once
+    # Arguments: Explored states: list, Frontier: PriorityQueue
+    # Returns: Boards: int
+    def held_nodes(self, explored_states, frontier):
+        put_back = sum(1 for state in frontier.queue if state.expanded_f is not None)
+        return len(explored_states) + frontier.qsize() - put_back
+
+    # Description: Approximates the bytes held by the explored states, the frontier and the dropped set
+    # Arguments: Explored states: list, Frontier: PriorityQueue
+    # Returns: Bytes: int
+    def current_bytes(self, explored_states, frontier):
+        return (self.held_nodes(explored_states, frontier) * self.node_bytes +
+                len(self.dropped) * self.encoding_bytes)
+
+    # Description: Drops explored boards that are not on the path of any frontier board, highest priority
+    # first, until usage is back to 3/4 of the cap or there is nothing left that can be dropped, and sets
+    # when the next trim is due
+    # Arguments: Explored states: list, Frontier: PriorityQueue
+    def trim(self, explored_states, frontier):
+        self.drop_unreferenced(explored_states, frontier)
+        reached = self.current_bytes(explored_states, frontier)
+        self.next_trim = reached + reached // 4 if reached > self.cap * 3 // 4 else 0
+
+    # Description: Drops up to enough unreferenced explored boards, highest priority first, to get usage
+    # back to 3/4 of the cap (see trim)
+    # Arguments: Explored states: list, Frontier: PriorityQueue
+    def drop_unreferenced(self, explored_states, frontier):
+        needed = set()                  # ids of frontier boards and every board on their paths
+        for state in frontier.queue:
+            while state is not None and id(state) not in needed:
+                needed.add(id(state))
+                state = state.parent
+        candidates = [state for state in explored_states if id(state) not in needed]
+        candidates.sort(key=lambda state: state.priority, reverse=True)
+        excess = self.current_bytes(explored_states, frontier) - self.cap * 3 // 4
+        drop = min(len(candidates), -(-excess // max(self.node_bytes - self.encoding_bytes, 1)))
+        drop = min(drop, len(explored_states) - 1)     # never empty the explored list
+        if drop <= 0:
+            return
+        dropped = set()
+        for state in candidates[:drop]:
+            dropped.add(id(state))
+            self.dropped.add(state.encode_state())
+            if state.parent is not None and state.parent.child is state:
+                state.parent.child = None   # the parent's child link would keep the board alive
+        explored_states[:] = [state for state in explored_states if id(state) not in dropped]
+        self.dropped_states += drop
+
+    # Description: Checks if a board was dropped by an earlier trim, so it is not searched again
+    # Arguments: Board: object
+    # Returns: True if the board was dropped, else False
+    def was_dropped(self, board):
+        return bool(self.dropped) and board.encode_state() in self.dropped
+
+    # Description: Returns the approximate peak memory in bytes
+    def peak_bytes(self):
+        return self.peak_memory
+
+    # Description: Prints the peak memory usage, and the number of dropped states if the cap was reached
+    def print_usage(self):
+        print("Peak states in memory: ", self.peak_nodes)
+        print("Peak memory (approx bytes): ", self.peak_bytes())
+        if self.dropped_states:
+            print("Explored states dropped: ", self.dropped_states)
+        if self.cap is not None and self.peak_memory > self.cap:
+            print("Memory cap exceeded: the frontier and the paths to it could not be dropped")
+
+
+# External Memory Breadth First Search Function
+# Description: Breadth first search for state spaces that do not fit in memory. Each depth layer is kept
+# on disk as a sorted file of packed state encodings (see Board.encode_state). Children of a layer are
+# collected in a buffer that is sorted and written out as a run file whenever it reaches the memory budget.
+# The runs are then merged, and duplicates are removed by merging against the previous two layers on disk
+# (every move can be undone, so a child can only be in the layer before, the current layer, or the next one).
+# Runs are merged MERGE_FAN_IN at a time (in several passes if there are more), and files are read and
+# written unbuffered in fixed size chunks. Half of memory_budget goes to the run buffer and the other half
+# is split between the chunks of the files open at once, so memory use is bounded by memory_budget (in bytes,
+# approximately) whatever the size of the state space. The search stops as soon as a goal state is generated.
+# Arguments: Start state: list of strings, Memory budget: int, Work directory: string (temporary dir if None),
+# Exit position: (row, column) tuple (default exit if None)
+# Returns: Total moves of the shortest solution: int, or 0 if a goal state is not possible
+def external_bfs(start, memory_budget=64 * 1024 * 1024, work_dir=None, exit_pos=None):
+    board = Board(0)
+    create_all_vehicles(start, board, 0, exit_pos)
+    goal_index = [vehicle.name for vehicle in board.vehicle_list].index('X')
+    car = board.vehicle_list[goal_index]
+    goal_coord = board.exit_col - car.length + 1 if car.pos[0] == board.exit_row else None
+    record_size = len(board.vehicle_list)
+    # rough per record cost of a bytes object
+    buffer_records = max(1, memory_budget // 2 // (record_size + 64))
+    # at most MERGE_FAN_IN runs, the two previous layers and the output file are open at once
+    chunk_records = max(1, memory_budget // 2 // ((MERGE_FAN_IN + 3) * record_size))
+
+    layer_dir = tempfile.mkdtemp(prefix='rushhour_bfs_', dir=work_dir)
+    try:
+        prev_layer = os.path.join(layer_dir, 'layer_prev')
+        curr_layer = os.path.join(layer_dir, 'layer_0')
+        write_records(prev_layer, [], record_size, chunk_records)
+        write_records(curr_layer, [board.encode_state()], record_size, chunk_records)
+        states_explored = 0
+        depth = 0
+
+        if is_goal_state(board):
+            print("Total moves: ", depth)
+            print("Total states explored: ", states_explored)
+            return depth
+
+        while True:
+            depth += 1
+            runs = []
+            buffer = []
+            for encoding in read_records(curr_layer, record_size, chunk_records):
+                states_explored += 1
+                board.load_encoding(encoding)
+                for child in board.neighbor_encodings():
+                    if child[goal_index] == goal_coord: # X reached the exit
+                        print("Total moves: ", depth)
+                        print("Total states explored: ", states_explored)
+                        return depth
+                    buffer.append(child)
+                if len(buffer) >= buffer_records:       # buffer is full, write out a sorted run
+                    runs.append(write_run(layer_dir, len(runs), buffer, record_size, chunk_records))
+                    buffer = []
+            if buffer:
+                runs.append(write_run(layer_dir, len(runs), buffer, record_size, chunk_records))
+                buffer = []
+
+            runs = merge_runs(layer_dir, runs, record_size, chunk_records)
+            next_layer = os.path.join(layer_dir, 'layer_' + str(depth))
+            merged = heapq.merge(*[read_records(run, record_size, chunk_records) for run in runs])
+            new_states = subtract_sorted(unique_sorted(merged),
+                                         read_records(prev_layer, record_size, chunk_records),
+                                         read_records(curr_layer, record_size, chunk_records))
+            layer_size = write_records(next_layer, new_states, record_size, chunk_records)
+            for run in runs:
+                os.remove(run)
+            os.remove(prev_layer)
+            prev_layer, curr_layer = curr_layer, next_layer
+
+            if layer_size == 0:                         # no new states, a goal state is not possible
+                print("Total moves: ", 0)
+                print("Total states explored: ", states_explored)
+                return 0
+    finally:
+        shutil.rmtree(layer_dir, ignore_errors=True)
+
+
+MERGE_FAN_IN = 8                # most run files external_bfs merges at once
+
+
+# Description: Writes encodings to a file, one fixed size record after another. The file is unbuffered and
+# records are written chunk_records at a time, so only one chunk is held in memory.
+# Arguments: Path: string, Encodings: iterable of bytes, Record size: int, Chunk records: int
+# Returns: Number of records written: int
+def write_records(path, encodings, record_size, chunk_records):
+    count = 0
+    chunk = bytearray()
+    with open(path, 'wb', buffering=0) as f:
+        for encoding in encodings:
+            chunk += encoding
+            count += 1
+            if len(chunk) >= record_size * chunk_records:
+                f.write(chunk)
+                chunk = bytearray()
+        if chunk:
+            f.write(chunk)
+    return count
+
+
+# Description: Sorts a buffer of encodings and writes it out as a run file for external_bfs
+# Arguments: Directory: string, Run name: int or string, Buffer: list of bytes, Record size: int,
+# Chunk records: int
+# Returns: Path of the run file: string
+def write_run(directory, run_name, buffer, record_size, chunk_records):
+    buffer.sort()
+    path = os.path.join(directory, 'run_' + str(run_name))
+    write_records(path, buffer, record_size, chunk_records)
+    return path
+
+
+# Description: Merges run files MERGE_FAN_IN at a time (dropping duplicates) until at most MERGE_FAN_IN
+# are left, so the number of files open at once does not grow with the number of runs
+# Arguments: Directory: string, Runs: list of paths, Record size: int, Chunk records: int
+# Returns: Runs: list of paths
+def merge_runs(directory, runs, record_size, chunk_records):
+    merge_pass = 0
+    while len(runs) > MERGE_FAN_IN:
+        merged_runs = []
+        for i in range(0, len(runs), MERGE_FAN_IN):
+            group = runs[i:i + MERGE_FAN_IN]
+            path = os.path.join(directory, 'run_' + str(merge_pass) + '_' + str(len(merged_runs)))
+            merged = heapq.merge(*[read_records(run, record_size, chunk_records) for run in group])
+            write_records(path, unique_sorted(merged), record_size, chunk_records)
+            for run in group:
+                os.remove(run)
+            merged_runs.append(path)
+        runs = merged_runs
+        merge_pass += 1
+    return runs
+
+
+# Description: Reads fixed size records back from an unbuffered file, chunk_records records at a time
+# Arguments: Path: string, Record size: int, Chunk records: int
+# Returns: Generator of encodings: bytes
+def read_records(path, record_size, chunk_records):
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            chunk = f.read(record_size * chunk_records)
+            if not chunk:
+                return
+            while len(chunk) % record_size:     # an unbuffered read can stop short, finish the last record
+                more = f.read(record_size - len(chunk) % record_size)
+                if not more:
+                    break
+                chunk += more
+            for i in range(0, len(chunk) - record_size + 1, record_size):
+                yield chunk[i:i + record_size]
+
+
+# Description: Drops repeated items from a sorted iterable
+# Arguments: Sorted items: iterable
+# Returns: Generator of unique items
+def unique_sorted(items):
+    last = None
+    for item in items:
+        if item != last:
+            yield item
+            last = item
+
+
+# Description: Yields the items of a sorted iterable that do not appear in any of the other sorted iterables,
+# walking all of them at the same time so nothing has to be loaded into memory
+# Arguments: Sorted items: iterable, Sorted items to remove: iterables
+# Returns: Generator of items
+def subtract_sorted(items, *to_remove):
+    heads = []
+    for other in to_remove:
+        other = iter(other)
+        heads.append([next(other, None), other])
+    for item in items:
+        found = False
+        for head in heads:
+            while head[0] is not None and head[0] < item:
+                head[0] = next(head[1], None)
+            if head[0] == item:
+                found = True
+        if not found:
+            yield item
 
 
 # Board Class
 # Description: Class to represent each state. Each board object will hold a list of vehicle object,
 # the heuristic value for that state, depth of the tree, and pointers to children nodes and/or parent node.
-# Argument: Takes the user input value (0 or 1) as the heuristic to use for the state search: 0 for
-# blocking heuristic, 1 for the custom heuristic.
+# Boards are size x size (set from the start state by create_all_vehicles, 6x6 by default). The goal is
+# reached when X covers the exit tile (exit_row, exit_col), which defaults to row (size - 1) // 2 on the
+# right edge (row 2, column 5 on a 6x6 board). X drives right to reach it, so the exit row can be set but
+# the exit is always on the right edge (create_all_vehicles rejects any other exit).
+# Argument: Takes the user input value (0, 1 or 2) as the heuristic to use for the state search: 0 for
+# blocking heuristic, 1 for the custom heuristic, 2 for the pattern database heuristic.
 class Board:
-    def __init__(self, heuristic_to_use):
+    def __init__(self, heuristic_to_use, size=6):
         self.vehicle_list = []      # list of vehicles objects, contains all we need to know for a state
+        self.size = size
+        self.exit_row = (size - 1) // 2
+        self.exit_col = size - 1
+        # occupancy grid, one string per row, kept in sync with vehicle_list. A move only rebuilds the rows
+        # it touches and a copy only copies the list of rows, so neither has to touch every tile of the board.
+        self.grid = ['-' * size] * size
         self.heuristic_to_use = heuristic_to_use
         self.priority = None        # our priority is the heuristic for the current board
         self.depth = 0
         self.parent = None
         self.child = None
+        self.last_move = None       # (vehicle index, swept tiles) of the move that created this board
+        self.distance_table = None  # optional DistanceTable shared by every board of a search
+        self.expanded_f = None      # partial expansion: children up to this priority are in the frontier
+        self.order = 0              # when the board was put in the frontier, breaks priority and depth ties
 
     # Description: Overloads '==' operator for board objects for priority queue.
-    # Compares if 2 board objects are equal by comparing each vehicle in their respective vehicle list
+    # Compares if 2 board objects are equal by comparing their occupancy grids. Since every vehicle
+    # name is unique, two boards of the same puzzle have the same grid only if every vehicle matches.
     def __eq__(self, other):
         if not isinstance(other, Board):
             return NotImplemented
-        for vehicle in self.vehicle_list:
-            vehicle_matched = False
-            for other_vehicle in other.vehicle_list:
-                if vehicle == other_vehicle:
-                    vehicle_matched = True
-            if vehicle_matched == False: return False
-        return True
+        return self.grid == other.grid
 
-    # Description: Overloads '<' operator for board objects for priority queue.
+    # Description: Overloads '<' operator for board objects for priority queue. Of the boards with the same
+    # priority the deepest comes out first (it is the closest to a goal), then the one put in first.
     def __lt__(self, other):
-        return self.priority < other.priority
+        return (self.priority, -self.depth, self.order) < (other.priority, -other.depth, other.order)
 
     # Description: Prints the heuristic for the board (if needed)
     def print_priority(self):
@@ -80,25 +588,59 @@ class Board:
     # Description: Prints the board
     def print_state(self):
         res = []
-        for i in range(6):
+        for i in range(self.size):
             row = []
-            for j in range(6):
+            for j in range(self.size):
                 row.append(self.is_occupied((i, j)))
             res.append(row)
-        for i in range(6):
-            for j in range(6):
+        for i in range(self.size):
+            for j in range(self.size):
                 print(res[i][j], end = " ")
             print()
         print()
 
+    # Description: Calculates the priority of the board with the heuristic chosen by the user.
+    # The heuristic is looked up in heuristic_cache by the board's blocker signature and is only
+    # computed (at depth 0) the first time a signature is seen. If the board has a distance table that
+    # holds the board, the exact distance to the goal is used instead.
+    def calculate_priority(self):
+        if self.distance_table is not None:
+            h = self.distance_table.distance(self)
+            if h is not None:
+                self.priority = 0 if h == 0 else self.depth + h
+                return
+        if self.heuristic_to_use == 2:      # table lookups already, nothing to gain from the cache
+            self.priority = pattern_database_heuristic(self, self.depth)
+            return
+        key = blocker_signature(self)
+        h = heuristic_cache.get(key)
+        if h is None:
+            if self.heuristic_to_use == 0:
+                h = blocking_heuristic(self, 0)
+            else:
+                h = custom_heuristic(self, 0)
+            heuristic_cache.put(key, h)
+        self.priority = 0 if h == 0 else self.depth + h     # 0 only for a goal state
+
     # Description: Increment the depth, used for heuristics
     def incr_depth(self):
         self.depth += 1
 
-    # Description: Adds a vehicle object to the board's list of vehicles
+    # Description: Adds a vehicle object to the board's list of vehicles and marks its tiles in the grid
     # Argument: Vehicle: Object
     def add_vehicle(self, vehicle):
         self.vehicle_list.append(vehicle)
+        for i in range(vehicle.length):
+            if vehicle.orientation == 'vertical':
+                self.set_tile((vehicle.pos[0] + i, vehicle.pos[1]), vehicle.name)
+            else:
+                self.set_tile((vehicle.pos[0], vehicle.pos[1] + i), vehicle.name)
+
+    # Description: Sets one tile of the occupancy grid (only the row holding the tile is rebuilt)
+    # Arguments: (x, y) coordinate: tuple, Vehicle name or '-': string
+    def set_tile(self, pos, name):
+        row = self.grid[pos[0]]
+        self.grid[pos[0]] = row[:pos[1]] + name + row[pos[1] + 1:]
 
     # Description: Returns a vehicle object, given the name of the vehicle
     # Argument: Name of the vehicle: string
@@ -111,14 +653,10 @@ class Board:
     # Description: Checks whether a position on the board is occupied by a vehicle
     # Argument: (x, y) coordinate to check
     # Returns: Name of the vehicle occupying the position, if no vehicle, then return '-' to signify an empty position
+    # (positions outside of the board are also reported as empty)
     def is_occupied(self, pos):
-        for vehicle in self.vehicle_list:
-            if vehicle.orientation == 'vertical':
-                if(vehicle.pos[0] <= pos[0] and (vehicle.pos[0] + vehicle.length) > pos[0] and vehicle.pos[1] == pos[1]):
-                    return vehicle.name
-            elif vehicle.orientation == 'horizontal':
-                if(vehicle.pos[1] <= pos[1] and (vehicle.pos[1] + vehicle.length) > pos[1] and vehicle.pos[0] == pos[0]):
-                    return vehicle.name
+        if 0 <= pos[0] < self.size and 0 <= pos[1] < self.size:
+            return self.grid[pos[0]][pos[1]]
         return '-'
 
 
@@ -127,74 +665,106 @@ class Board:
     # and the next position is not occupied by another vehicle), then make a copy of current board and apply the
     # movement changes (i.e move the vehicle and calculate new heuristic). Check if that new board object is in
     # either the explored_states list or frontier. If it is, do not add to the new_states list. Else, add to list.
-    # Argument: Explored States: list, States in frontier: list
-    # Returns: New states: list
-    def generate_new_states(self, explored_states, states_in_frontier):
-        new_states = [] # create list of new states to be added to the frontier
+    # Moves that commute with the move that created this board are only applied in one order (see
+    # move_pruned), so the same board is not generated again along every ordering of independent moves.
+    # Searches that can throw away the other order (like beam search) turn this off with prune_moves.
+    # If a frontier is given and a new board is already in it at a greater depth, the stored board is moved
+    # onto this shorter path (parent, depth and priority) and the frontier is re-heapified (a decrease-key).
+    # The states are yielded one at a time so the caller can stop as soon as it finds a goal.
+    # Argument: Explored States: list, States in frontier: list, Prune moves: bool, Frontier: PriorityQueue
+    # Returns: Generator of new states
+    def generate_new_states(self, explored_states, states_in_frontier, prune_moves=True, frontier=None):
+        for index, vehicle in enumerate(self.vehicle_list):
+            for movement in self.legal_movements(vehicle):
+                swept = swept_tiles(vehicle, movement, self.size)
+                if prune_moves and self.move_pruned(index, swept):  # reached by the canonical move order
+                    continue
+                new_board = self.copy_self()            # create a copy of the current board
+                new_board.parent = self                 # link between parent & child node for path
+                self.child = new_board
+                new_board.incr_depth()                  # increment depth since this is a new node
+                new_board.move_vehicle(index, movement)     # apply movement
+                new_board.last_move = (index, swept)
+                new_board.calculate_priority()          # apply heuristic depending on user input
+                # check if the new state is in either explored states or the frontier
+                if not self.state_explored(new_board, explored_states, states_in_frontier):
+                    yield new_board
+                elif new_board in states_in_frontier:
+                    # reached again by a different last move, so the pruning of the stored board is no longer
+                    # safe: the moves it would skip may be the only way to reach some boards
+                    duplicate = states_in_frontier[states_in_frontier.index(new_board)]
+                    if duplicate.last_move != new_board.last_move:
+                        duplicate.last_move = None
+                    if frontier is not None and new_board.depth < duplicate.depth:
+                        duplicate.parent = self
+                        self.child = duplicate
+                        duplicate.depth = new_board.depth
+                        duplicate.priority = new_board.priority
+                        heapq.heapify(frontier.queue)   # the board moved up, restore the heap order
 
-        for vehicle in self.vehicle_list:
-            if vehicle.orientation == 'vertical':   # vertical vehicles can only move up or down
-                if vehicle.can_move_up() and self.is_occupied((vehicle.pos[0] - 1, vehicle.pos[1])) == '-':
-                    new_board = self.copy_self()            # create a copy of the current board
-                    new_board.parent = self                 # link between parent & child node for path
-                    self.child = new_board
-                    new_board.incr_depth()                  # increment depth since this is a new node
-                    new_board.move_vehicle(vehicle, 'up')   # apply movement
-                    if new_board.heuristic_to_use == 0:     # apply heuristic depending on user input
-                        new_board.priority = blocking_heuristic(new_board, new_board.depth)
-                    else:
-                        new_board.priority = custom_heuristic(new_board, new_board.depth)
-                    # check if the new state is in either explored states or the frontier
-                    if not self.state_explored(new_board, explored_states, states_in_frontier): new_states.append(new_board)
-                if vehicle.can_move_down() and self.is_occupied((vehicle.pos[0] + vehicle.length, vehicle.pos[1])) == '-':
-                    new_board = self.copy_self()
-                    new_board.parent = self
-                    self.child = new_board
-                    new_board.incr_depth()
-                    new_board.move_vehicle(vehicle, 'down')
-                    if new_board.heuristic_to_use == 0:
-                        new_board.priority = blocking_heuristic(new_board, new_board.depth)
-                    else:
-                        new_board.priority = custom_heuristic(new_board, new_board.depth)
-                    if not self.state_explored(new_board, explored_states, states_in_frontier): new_states.append(new_board)
-            elif vehicle.orientation == 'horizontal':
-                if vehicle.can_move_left() and self.is_occupied((vehicle.pos[0], vehicle.pos[1] - 1)) == '-':
-                    new_board = self.copy_self()
-                    new_board.parent = self
-                    self.child = new_board
-                    new_board.incr_depth()
-                    new_board.move_vehicle(vehicle, 'left')
-                    if new_board.heuristic_to_use == 0:
-                        new_board.priority = blocking_heuristic(new_board, new_board.depth)
-                    else:
-                        new_board.priority = custom_heuristic(new_board, new_board.depth)
-                    if not self.state_explored(new_board, explored_states, states_in_frontier): new_states.append(new_board)
-                if vehicle.can_move_right() and self.is_occupied((vehicle.pos[0], vehicle.pos[1] + vehicle.length)) == '-':
-                    new_board = self.copy_self()
-                    new_board.parent = self
-                    self.child = new_board
-                    new_board.incr_depth()
-                    new_board.move_vehicle(vehicle, 'right')
-                    if new_board.heuristic_to_use == 0:
-                        new_board.priority = blocking_heuristic(new_board, new_board.depth)
-                    else:
-                        new_board.priority = custom_heuristic(new_board, new_board.depth)
-                    if not self.state_explored(new_board, explored_states, states_in_frontier): new_states.append(new_board)
+    # Description: Finds the operators that can be applied to a vehicle, i.e in bound of the board
+    # and the next position is not occupied by another vehicle
+    # Argument: Vehicle: Object
+    # Returns: Movements: list of strings
+    def legal_movements(self, vehicle):
+        movements = []
+        if vehicle.orientation == 'vertical':   # vertical vehicles can only move up or down
+            if vehicle.can_move_up() and self.is_occupied((vehicle.pos[0] - 1, vehicle.pos[1])) == '-':
+                movements.append('up')
+            if (vehicle.can_move_down(self.size)
+                    and self.is_occupied((vehicle.pos[0] + vehicle.length, vehicle.pos[1])) == '-'):
+                movements.append('down')
+        elif vehicle.orientation == 'horizontal':
+            if vehicle.can_move_left() and self.is_occupied((vehicle.pos[0], vehicle.pos[1] - 1)) == '-':
+                movements.append('left')
+            if (vehicle.can_move_right(self.size)
+                    and self.is_occupied((vehicle.pos[0], vehicle.pos[1] + vehicle.length)) == '-'):
+                movements.append('right')
+        return movements
 
-        return new_states
+    # Description: Checks if a move can be skipped because it commutes with the move that created this board.
+    # Two moves of different vehicles are independent when their swept tiles do not overlap, so they reach the
+    # same board in either order. Only the order where the vehicle with the lower index moves first is kept.
+    # Arguments: Index of the vehicle to move: int, Swept tiles of the move: frozenset
+    # Returns: True if the move is redundant, else False
+    def move_pruned(self, index, swept):
+        if self.last_move is None:
+            return False
+        last_index, last_swept = self.last_move
+        return index < last_index and swept.isdisjoint(last_swept)
 
 
     # Description: Move a vehicle by changing the start position of the vehicle. X coordinate for
-    # vertical vehicles and Y coordinate for horizontal vehicles
-    # Arguments: Vehicle: Object, Type of movement: String
+    # vertical vehicles and Y coordinate for horizontal vehicles. Vehicle objects are shared between a board
+    # and its copies, so the moved vehicle is replaced by a new object instead of changed in place. Only the
+    # grid rows holding the tile the vehicle leaves and the tile it enters are rebuilt in the occupancy grid.
+    # A Vehicle can be passed instead of the index (the vehicle with the same name is moved), but the object
+    # passed in keeps its old position.
+    # Arguments: Index of the vehicle in vehicle_list: int (or Vehicle: object), Type of movement: String
     # Returns: None
-    def move_vehicle(self, vehicle_to_move, movement):
-        for vehicle in self.vehicle_list:
-            if vehicle.name == vehicle_to_move.name:
-                if movement == 'up': vehicle.pos = (vehicle.pos[0] - 1, vehicle.pos[1])
-                if movement == 'down': vehicle.pos = (vehicle.pos[0] + 1, vehicle.pos[1])
-                if movement == 'left': vehicle.pos = (vehicle.pos[0], vehicle.pos[1] - 1)
-                if movement == 'right': vehicle.pos = (vehicle.pos[0], vehicle.pos[1] + 1)
+    def move_vehicle(self, index, movement):
+        if isinstance(index, Vehicle):
+            index = [vehicle.name for vehicle in self.vehicle_list].index(index.name)
+        vehicle = self.vehicle_list[index]
+        x, y = vehicle.pos
+        if movement == 'up':
+            self.set_tile((x + vehicle.length - 1, y), '-')
+            self.set_tile((x - 1, y), vehicle.name)
+            x -= 1
+        if movement == 'down':
+            self.set_tile((x, y), '-')
+            self.set_tile((x + vehicle.length, y), vehicle.name)
+            x += 1
+        if movement == 'left':
+            row = self.grid[x]
+            self.grid[x] = row[:y - 1] + vehicle.name * vehicle.length + '-' + row[y + vehicle.length:]
+            y -= 1
+        if movement == 'right':
+            row = self.grid[x]
+            self.grid[x] = row[:y] + '-' + vehicle.name * vehicle.length + row[y + vehicle.length + 1:]
+            y += 1
+        self.vehicle_list[index] = Vehicle(vehicle.name, vehicle.orientation, vehicle.length, (x, y),
+                                           vehicle.size)
 
     # Description: Checks if a state is in either explored states or frontier
     # Arguments: Explored states: list, States in frontier: list
@@ -206,16 +776,20 @@ class Board:
             return True
         return False
 
-    # Description: Makes a new board copy of itself
+    # Description: Makes a new board copy of itself. The vehicle objects and grid rows are shared with this
+    # board (move_vehicle replaces what it changes), so a copy only copies two lists of references.
     # Arguments: None
     # Returns: New board: obj
     def copy_self(self):
         new_board = Board(self.heuristic_to_use)
         new_board.priority = self.priority
         new_board.depth = self.depth
-
-        for vehicle in self.vehicle_list:
-            new_board.add_vehicle(Vehicle(vehicle.name, vehicle.orientation, vehicle.length, vehicle.pos))
+        new_board.size = self.size
+        new_board.exit_row = self.exit_row
+        new_board.exit_col = self.exit_col
+        new_board.grid = self.grid[:]   # rows are shared until a move rebuilds one
+        new_board.distance_table = self.distance_table
+        new_board.vehicle_list = self.vehicle_list[:]
         return new_board
 
     # Description: Makes a copy of a vehicle
@@ -224,20 +798,66 @@ class Board:
     def copy_vehicle(self, vehicle_to_copy):
         for vehicle in self.vehicle_list:
             if vehicle == vehicle_to_copy:
-                return Vehicle(vehicle.name, vehicle.orientation, vehicle.length, vehicle.pos)
+                return Vehicle(vehicle.name, vehicle.orientation, vehicle.length, vehicle.pos, vehicle.size)
+
+    # Description: Packs the board into bytes, one byte per vehicle (in vehicle_list order) holding the
+    # coordinate the vehicle can move along: X coordinate for vertical vehicles, Y for horizontal vehicles
+    # Arguments: None
+    # Returns: Encoding: bytes
+    def encode_state(self):
+        return bytes(vehicle.pos[0] if vehicle.orientation == 'vertical' else vehicle.pos[1]
+                     for vehicle in self.vehicle_list)
+
+    # Description: Moves every vehicle to the position stored in an encoding made by encode_state
+    # and rebuilds the occupancy grid. The board must hold the same vehicles as the encoded board.
+    # The vehicles are moved in place, so only use it on a board that was not copied with copy_self
+    # (a scratch board made by create_all_vehicles).
+    # Arguments: Encoding: bytes
+    # Returns: None
+    def load_encoding(self, encoding):
+        vehicles = self.vehicle_list
+        self.vehicle_list = []
+        self.grid = ['-' * self.size] * self.size
+        for vehicle, coord in zip(vehicles, encoding):
+            if vehicle.orientation == 'vertical':
+                vehicle.pos = (coord, vehicle.pos[1])
+            else:
+                vehicle.pos = (vehicle.pos[0], coord)
+            self.add_vehicle(vehicle)
+
+    # Description: Generates the encodings of every board one move away from this board. Works directly on
+    # the occupancy grid and the packed bytes, so no board objects are created.
+    # Arguments: None
+    # Returns: Encodings: list of bytes
+    def neighbor_encodings(self):
+        encoding = self.encode_state()
+        neighbors = []
+        for i, vehicle in enumerate(self.vehicle_list):
+            x, y = vehicle.pos
+            if vehicle.orientation == 'vertical':
+                before, after = (x - 1, y), (x + vehicle.length, y)
+            else:
+                before, after = (x, y - 1), (x, y + vehicle.length)
+            if encoding[i] > 0 and self.is_occupied(before) == '-':
+                neighbors.append(encoding[:i] + bytes((encoding[i] - 1,)) + encoding[i + 1:])
+            if encoding[i] + vehicle.length < self.size and self.is_occupied(after) == '-':
+                neighbors.append(encoding[:i] + bytes((encoding[i] + 1,)) + encoding[i + 1:])
+        return neighbors
 
 
 # Vehicle Class
 # Description: Class to represent each vehicle on the board. Attributes include
 # the vehicle's name, orientation, length of the vehicle, and starting position
-# on the board (top most tile for vertical vehicles, left most tile for horizontal)
-# Arguments: Name: string, orientation: string, length: int, position: tuple
+# on the board (top most tile for vertical vehicles, left most tile for horizontal), and the size of the
+# board it is on (used by can_move_down and can_move_right when no size is given)
+# Arguments: Name: string, orientation: string, length: int, position: tuple, board size: int
 class Vehicle:
-    def __init__(self, name, orientation, length, pos):
+    def __init__(self, name, orientation, length, pos, size=6):
         self.name = name
         self.orientation = orientation
         self.length = length
         self.pos = pos
+        self.size = size
 
     # Description: Overloads '==' operator for vehicle objects.
     # Compares if two vehicles are the same by comparing all class attributes
@@ -268,58 +888,290 @@ class Vehicle:
             return False
 
     # Description: Checks if the vehicle is within bounds to move down
-    def can_move_down(self):
-        if self.pos[0] + self.length <= 5:
+    # Argument: Board size: int (the size of the vehicle's board if None)
+    def can_move_down(self, size=None):
+        if size is None:
+            size = self.size
+        if self.pos[0] + self.length <= size - 1:
             return True
         else:
             return False
 
     # Description: Checks if the vehicle is within bounds to move right
-    def can_move_right(self):
-        if self.pos[1] + self.length <= 5:
+    # Argument: Board size: int (the size of the vehicle's board if None)
+    def can_move_right(self, size=None):
+        if size is None:
+            size = self.size
+        if self.pos[1] + self.length <= size - 1:
             return True
         else:
             return False
 
 
 
+# Description: Finds the tiles a vehicle covers before and after a move (grid indices, row major)
+# Arguments: Vehicle: object, Type of movement: string, Board size: int
+# Returns: Swept tiles: frozenset
+def swept_tiles(vehicle, movement, size):
+    x, y = vehicle.pos
+    if movement == 'up': x -= 1
+    if movement == 'left': y -= 1
+    if vehicle.orientation == 'vertical':
+        return frozenset((x + i) * size + y for i in range(vehicle.length + 1))
+    else:
+        return frozenset(x * size + y + i for i in range(vehicle.length + 1))
+
+
+# Distance Table Class
+# Description: Read-only table of exact distances to the goal for every board of one vehicle set, stored in
+# a single flat buffer so it can be published once into shared memory or a file and attached by any number
+# of solver processes without copying (attaching only reads the header). Boards are keyed by the coordinate
+# each vehicle moves along, with vehicles sorted by name, so the key does not depend on parse order.
+# Buffer layout: header (spec length, record size, record count), the vehicle spec, the sorted keys, then
+# one distance byte per key (UNSOLVABLE if no goal can be reached from that board).
+# Arguments: Buffer: bytes-like, Owner: object keeping the buffer alive (shared memory or mmap), or None
+class DistanceTable:
+    HEADER = struct.Struct('<III')
+    UNSOLVABLE = 255
+
+    def __init__(self, buffer, owner=None):
+        self.owner = owner
+        self.buffer = memoryview(buffer).toreadonly()
+        spec_length, self.record_size, self.count = self.HEADER.unpack_from(self.buffer, 0)
+        self.spec = bytes(self.buffer[self.HEADER.size:self.HEADER.size + spec_length]).decode()
+        self.keys_start = self.HEADER.size + spec_length
+        self.distances_start = self.keys_start + self.record_size * self.count
+
+    # Description: Looks up the exact distance from a board to the goal with a binary search over the keys
+    # Arguments: Board: object
+    # Returns: Distance: int (UNSOLVABLE if no goal can be reached), or None if the board is not in the table
+    def distance(self, board):
+        if vehicle_spec(board) != self.spec:
+            return None
+        key = table_key(board)
+        index = bisect_left(self, key, 0, self.count)
+        if index == self.count or self[index] != key:
+            return None
+        return self.buffer[self.distances_start + index]
+
+    # Description: Returns the key stored at an index (used by the binary search)
+    def __getitem__(self, index):
+        start = self.keys_start + index * self.record_size
+        return bytes(self.buffer[start:start + self.record_size])
+
+    def __len__(self):
+        return self.count
+
+    # Description: Copies the table into a new shared memory block. The caller keeps the returned block
+    # alive while workers use it, and calls close() and unlink() on it when done.
+    # Arguments: Name of the shared memory block: string (random name if None)
+    # Returns: SharedMemory: object
+    def publish_shared(self, name=None):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(self.buffer))
+        shm.buf[:len(self.buffer)] = self.buffer
+        return shm
+
+    # Description: Attaches to a table published with publish_shared, without copying it
+    # Arguments: Name of the shared memory block: string
+    # Returns: DistanceTable: object
+    @classmethod
+    def attach_shared(cls, name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:   # track was added in Python 3.13; pools share the publisher's tracker anyway
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm.buf, owner=shm)
+
+    # Description: Writes the table to a file that can be opened with open_mapped
+    # Arguments: Path: string
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.buffer)
+
+    # Description: Memory-maps a table file read-only, without copying it
+    # Arguments: Path: string
+    # Returns: DistanceTable: object
+    @classmethod
+    def open_mapped(cls, path):
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, owner=mapped)
+
+    # Description: Releases the buffer (the shared memory block or file is left in place)
+    def close(self):
+        self.buffer.release()
+        if self.owner is not None:
+            self.owner.close()
+            self.owner = None
+
+
+# Description: Describes the vehicle set of a board: the board size and exit, then each vehicle's name,
+# orientation, length and the coordinate it cannot move along, sorted by name
+# Arguments: Board: object
+# Returns: Spec: string
+def vehicle_spec(board):
+    spec = [str(board.size) + ',' + str(board.exit_row) + ',' + str(board.exit_col)]
+    for vehicle in sorted(board.vehicle_list, key=lambda v: v.name):
+        fixed = vehicle.pos[1] if vehicle.orientation == 'vertical' else vehicle.pos[0]
+        spec.append(vehicle.name + vehicle.orientation[0] + str(vehicle.length) + str(fixed))
+    return ';'.join(spec)
+
+
+# Description: Packs a board into a DistanceTable key: the coordinate each vehicle moves along,
+# with vehicles sorted by name
+# Arguments: Board: object
+# Returns: Key: bytes
+def table_key(board):
+    return bytes(vehicle.pos[0] if vehicle.orientation == 'vertical' else vehicle.pos[1]
+                 for vehicle in sorted(board.vehicle_list, key=lambda v: v.name))
+
+
+# Description: Builds a DistanceTable for every board reachable from a start state. All reachable boards
+# are enumerated, then a breadth first search backwards from the goal boards gives the exact distances
+# (every move can be undone, so searching backwards uses the same moves).
+# Arguments: Start state: list of strings, Exit position: (row, column) tuple (default exit if None)
+# Returns: DistanceTable: object
+def build_distance_table(start, exit_pos=None):
+    board = Board(0)
+    create_all_vehicles(start, board, 0, exit_pos)
+    spec = vehicle_spec(board).encode()
+    board.vehicle_list.sort(key=lambda v: v.name)   # encode_state now gives table keys
+    goal_index = [vehicle.name for vehicle in board.vehicle_list].index('X')
+
+    neighbors = {}                                  # every reachable board and the boards one move away
+    to_visit = [board.encode_state()]
+    while to_visit:
+        encoding = to_visit.pop()
+        if encoding in neighbors:
+            continue
+        board.load_encoding(encoding)
+        neighbors[encoding] = board.neighbor_encodings()
+        to_visit.extend(neighbors[encoding])
+
+    distances = {}
+    layer = []
+    car = board.get_vehicle('X')
+    if car.pos[0] == board.exit_row:                # X never leaves its row, so goals need it in the exit row
+        goal_coord = board.exit_col - car.length + 1
+        layer = [encoding for encoding in neighbors if encoding[goal_index] == goal_coord]
+    depth = 0
+    while layer:
+        next_layer = []
+        for encoding in layer:
+            if encoding not in distances:
+                distances[encoding] = min(depth, DistanceTable.UNSOLVABLE - 1)
+                next_layer.extend(neighbors[encoding])
+        layer = next_layer
+        depth += 1
+
+    keys = sorted(neighbors)
+    buffer = bytearray(DistanceTable.HEADER.pack(len(spec), len(board.vehicle_list), len(keys)))
+    buffer += spec
+    for key in keys:
+        buffer += key
+    buffer += bytes(distances.get(key, DistanceTable.UNSOLVABLE) for key in keys)
+    return DistanceTable(bytes(buffer))
+
+
+# Heuristic Cache Class
+# Description: Bounded least recently used memo for heuristic values, with hit and miss counters.
+# Used by Board.calculate_priority so a heuristic is computed once per blocker signature instead of
+# once per generated board.
+# Arguments: Max size: int
+class HeuristicCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Description: Looks up a value and marks it as recently used
+    # Arguments: Key: tuple
+    # Returns: Cached value, or None if the key is not cached
+    def get(self, key):
+        h = self.values.get(key)
+        if h is None:
+            self.misses += 1
+            return None
+        self.values.move_to_end(key)
+        self.hits += 1
+        return h
+
+    # Description: Stores a value, removing the least recently used one if the cache is full
+    # Arguments: Key: tuple, Value: int
+    def put(self, key, value):
+        self.values[key] = value
+        if len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+
+    # Description: Empties the cache and resets the counters
+    def clear(self):
+        self.values.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+heuristic_cache = HeuristicCache()
+
+
+# Description: Builds the key the heuristics depend on: the heuristic in use, the board size and exit, the
+# position of the X car, and every vehicle in the exit row between X and the exit (the blocking vehicles)
+# with its orientation, length and position. Boards with the same signature have the same heuristic value
+# (not counting the depth).
+# Arguments: Board: object
+# Returns: Signature: tuple
+def blocker_signature(board):
+    car = board.get_vehicle('X')
+    blockers = []
+    for y in range(car.pos[1] + car.length, board.exit_col + 1):
+        name = board.is_occupied((board.exit_row, y))
+        if name != '-' and name not in blockers:
+            blockers.append(name)
+    signature = [board.heuristic_to_use, board.size, board.exit_row, board.exit_col, car.pos]
+    for name in blockers:
+        vehicle = board.get_vehicle(name)
+        signature.append((name, vehicle.orientation, vehicle.length, vehicle.pos))
+    return tuple(signature)
+
+
 # Function: Blocking heuristic
-# Description: Calculates the blocking heuristic: f(n) = g(n) + h(n)
+# Description: Calculates the blocking heuristic: f(n) = g(n) + h(n). Every blocking vehicle needs at least
+# one move and X needs one move per tile it still has to drive (see remaining_drive), so h(n) never
+# overestimates and a goal driven out by clear_path_to_goal costs exactly the priority of the board it left.
 # Arguments: Board: object, Depth: int
-# Return: 0, if the board is a goal state, else the num of blocked cars + depth + 1
+# Return: 0, if the board is a goal state, else the num of blocked cars + depth + X's remaining drive
 def blocking_heuristic(board, depth): # h(n)
     blocked_cars = 0
     blocked_cars_dict = {}
 
-    curr_tile = 0 # find the Y coordinate of the first tile past the X car
-    while board.is_occupied((2,curr_tile)) != 'X':
-        curr_tile = curr_tile + 1
-    curr_tile = curr_tile + 2
+    car = board.get_vehicle('X')
+    curr_tile = car.pos[1] + car.length # Y coordinate of the first tile past the X car (any length)
 
-    while curr_tile <= 5: # scan the row past the X car
-        if board.is_occupied((2,curr_tile)) != '-': # if a letter is encountered
-            if board.is_occupied((2,curr_tile)) in blocked_cars_dict:
+    while curr_tile <= board.exit_col: # scan the row past the X car
+        if board.is_occupied((board.exit_row, curr_tile)) != '-': # if a letter is encountered
+            if board.is_occupied((board.exit_row, curr_tile)) in blocked_cars_dict:
                 pass
             else:
                 blocked_cars = blocked_cars + 1 # increment the num of blocked cars
-                blocked_cars_dict[board.is_occupied((2,curr_tile))] = 1 # place in dict so we know we encountered the same car
+                # place in dict so we know we encountered the same car
+                blocked_cars_dict[board.is_occupied((board.exit_row, curr_tile))] = 1
         curr_tile = curr_tile + 1
 
     if blocked_cars == 0 and is_goal_state(board): # if there are no blocked cars, then return 0
         return 0
     else:
-        return (depth + (blocked_cars + 1)) # f(n) = g(n) + h(n)
+        return (depth + (blocked_cars + remaining_drive(board))) # f(n) = g(n) + h(n)
 
 
 # Function: Custom Heuristic
 # Description: My heuristic deals with the number of shifts it takes for blocked vehicles to move
-# away from the (2,Y) row blocking the X car. For each blocked vehicle, it calculates the number
-# of shifts needed move up or down away from the goal row. The minimum amount of shifts is taken
+# away from the exit row (row 2 on a 6x6 board) blocking the X car. For each blocked vehicle, it calculates
+# the number of shifts needed move up or down away from the goal row. The minimum amount of shifts is taken
 # between the two (because we want the least amount of shifts). If there are other vehicles blocking
 # that vehicle from moving up or down then we also count those number of vehicles as shifts. We add
 # all the shifts needed between all the blocked vehicles.
-# The heuristic will then be the f(n) = depth + (num of shifts for blocked cars + 1)
-# Or 0 when there is a goal state.
+# The heuristic will then be the f(n) = depth + (num of shifts for blocked cars + X's remaining drive)
+# Or 0 when there is a goal state. X moves one tile per move, so its drive to the exit is counted in full.
 # This heuristic is just as good or better than the blocking heuristic because it considers the LEAST
 # number of shifts for each blocked vehicle to be moved since we take the minimum between the up and
 # down shifts. We only consider up and down as movements since horizontal vehicles on the 'X' row will
@@ -327,34 +1179,35 @@ def blocking_heuristic(board, depth): # h(n)
 # Arguments: Board: object, Depth: int
 # Returns: 0, if board is a goal state, else the num of shifts + depth
 def custom_heuristic(board, depth):
-    # count the amount of moves necessary to move out of row 2
+    # count the amount of moves necessary to move out of the exit row
     blocked_cars = 0
     blocked_cars_dict = {}
 
-    curr_tile = 0 # find the Y coordinate of the first tile past the X car
-    while board.is_occupied((2,curr_tile)) != 'X':
-        curr_tile = curr_tile + 1
-    curr_tile = curr_tile + 2
+    car = board.get_vehicle('X')
+    curr_tile = car.pos[1] + car.length # Y coordinate of the first tile past the X car (any length)
 
     shifts = 0    # total amount of shifts for every blocked vehicle to move away from X's path to goal
-    while curr_tile <= 5:
-        if board.is_occupied((2,curr_tile)) != '-': # if the current tile is not empty
-            curr_vehicle = board.is_occupied((2,curr_tile))
+    while curr_tile <= board.exit_col:
+        if board.is_occupied((board.exit_row, curr_tile)) != '-': # if the current tile is not empty
+            curr_vehicle = board.is_occupied((board.exit_row, curr_tile))
             if curr_vehicle in blocked_cars_dict:   # if the letter has already been encountered
                 pass
             else:
                 vehicle = board.copy_vehicle(board.get_vehicle(curr_vehicle))
-                if vehicle.orientation == 'vertical': # only check vertical because horizontal vehicles result in no goal
+                # only check vertical because horizontal vehicles result in no goal
+                if vehicle.orientation == 'vertical':
                     head = copy.deepcopy(vehicle.pos[0]) # head of the vehicle
                     down_shifts = 0
                     # down
-                    while(head + vehicle.length - 1) <= 5:
-                        if vehicle.can_move_down() and board.is_occupied((head - 1, vehicle.pos[1])): # if adj tile is blocked
-                            down_shifts += 2
-                        elif vehicle.can_move_down() and not board.is_occupied((head - 1, vehicle.pos[1])): # if adj tile is empty
-                            down_shifts += 1
+                    while(head + vehicle.length - 1) <= board.size - 1:
+                        adj_tile = (head - 1, vehicle.pos[1])
+                        if vehicle.can_move_down(board.size) and board.is_occupied(adj_tile):
+                            down_shifts += 2    # adj tile is blocked
+                        elif vehicle.can_move_down(board.size) and not board.is_occupied(adj_tile):
+                            down_shifts += 1    # adj tile is empty
                         head += 1
-                        if head > 2: # if head of the vehicle is below the row, then we found the num of down shifts needed
+                        # if head of the vehicle is below the row, then we found the num of down shifts needed
+                        if head > board.exit_row:
                             break
                     # up
                     head = copy.deepcopy(vehicle.pos[0])
@@ -365,31 +1218,257 @@ def custom_heuristic(board, depth):
                         elif vehicle.can_move_up() and not board.is_occupied((head + 1, vehicle.pos[1])):
                             up_shifts += 1
                         head += 1
-                        if (head + vehicle.length - 1) > 2: # if the tail of the vehicle is above the row, we found the num of up's
+                        # if the tail of the vehicle is above the row, we found the num of up's
+                        if (head + vehicle.length - 1) > board.exit_row:
                             break
 
-                    # take the minimum shifts between the two operators because we want the least amount of shifts to do so this
-                    # will result in a lower heuristic for the search to go to
+                    # take the minimum shifts between the two operators because we want the least amount of
+                    # shifts to do so this will result in a lower heuristic for the search to go to
                     shifts += min(down_shifts, up_shifts)
         curr_tile = curr_tile + 1
 
     if shifts == 0 and is_goal_state(board):
         return 0
     else:
-        return (depth + shifts + 1)
+        return (depth + shifts + remaining_drive(board))
+
+
+
+# Function: Pattern Database Heuristic
+# Description: Additive pattern database heuristic. The vehicles other than X are split into groups
+# (see PatternDatabase) and each group, together with X, is solved exactly on a board where every
+# other vehicle has been removed. Removing vehicles can only make the puzzle easier, and each table
+# only counts the moves of its own vehicles (X's moves are only counted by the first table), so the
+# sum of the tables never counts a real move twice and never overestimates the moves left.
+# The tables are built once per vehicle set and cached on disk (see PatternDatabase.load).
+# Arguments: Board: object, Depth: int
+# Returns: 0, if the board is a goal state, else the sum of the table distances + depth
+def pattern_database_heuristic(board, depth):
+    if is_goal_state(board):
+        return 0
+    database = PatternDatabase.for_board(board)
+    return depth + database.distance(board)
+
+
+# Pattern Database Class
+# Description: Exact distances to the goal for X plus a group of vehicles, one table per group, with
+# every other vehicle abstracted away. Each table is a flat byte array (a read-only view of the memory-mapped
+# cache file, see open_mapped) indexed by the coordinates of the group's vehicles (the coordinate each one
+# moves along) so a lookup is a few multiplications.
+# Vehicles crossing the exit row between X and the exit are grouped first since they matter most.
+# Arguments: Board: object (any board of the vehicle set), Group size: int (vehicles per table besides X)
+class PatternDatabase:
+    UNSOLVABLE = 255
+    CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'rushhour_pdb')
+    loaded = {}                 # vehicle spec: PatternDatabase, so each process builds or loads a set once
+
+    def __init__(self, board, group_size=3):
+        self.size = board.size
+        self.exit_row = board.exit_row
+        self.exit_col = board.exit_col
+        self.vehicles = {vehicle.name: Vehicle(vehicle.name, vehicle.orientation, vehicle.length, vehicle.pos,
+                                               vehicle.size)
+                         for vehicle in board.vehicle_list}
+        car = self.vehicles['X']
+        others = sorted((name for name in self.vehicles if name != 'X'),
+                        key=lambda name: (not self.crosses_exit_row(self.vehicles[name], car), name))
+        self.groups = [['X'] + others[i:i + group_size] for i in range(0, len(others), group_size)] or [['X']]
+        self.radixes = [[self.size - self.vehicles[name].length + 1 for name in group]
+                        for group in self.groups]
+        self.tables = []
+        self.mapped = None      # mmap of the cache file the tables are views of, kept open while in use
+
+    # Description: Checks if a vehicle covers a tile of the exit row between X and the exit
+    # Arguments: Vehicle: object, X car: object
+    # Returns: True if the vehicle can block X, else False
+    def crosses_exit_row(self, vehicle, car):
+        if vehicle.orientation == 'vertical':
+            return car.pos[1] + car.length <= vehicle.pos[1] <= self.exit_col
+        return vehicle.pos[0] == self.exit_row
+
+    # Description: Returns the pattern database for a board's vehicle set, loading it from the disk
+    # cache or building it the first time the vehicle set is seen
+    # Arguments: Board: object
+    # Returns: PatternDatabase: object
+    @classmethod
+    def for_board(cls, board):
+        spec = vehicle_spec(board)
+        database = cls.loaded.get(spec)
+        if database is None:
+            database = cls(board)
+            database.load(spec)
+            cls.loaded[spec] = database
+        return database
+
+    # Description: Loads the tables from the disk cache, or builds and saves them if they are not there
+    # (the cache is skipped if it cannot be written). The cache file is memory-mapped read-only like
+    # DistanceTable.open_mapped, so every process using the same vehicle set shares one copy of the tables.
+    # Arguments: Vehicle spec: string
+    def load(self, spec):
+        key = spec + '|' + ';'.join(','.join(group) for group in self.groups)
+        path = os.path.join(self.CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + '.pdb')
+        if self.open_mapped(path):
+            return
+        self.tables = [self.build_table(group, radixes, count_x=(i == 0))
+                       for i, (group, radixes) in enumerate(zip(self.groups, self.radixes))]
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                for table in self.tables:
+                    f.write(table)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            return
+        self.open_mapped(path)      # swap the built tables for the shared mapping
+
+    # Description: Memory-maps a cache file read-only and splits it into the tables, without copying them
+    # Arguments: Path: string
+    # Returns: True if the file was mapped, False if it is missing or does not match the groups
+    def open_mapped(self, path):
+        sizes = [product(radixes) for radixes in self.radixes]
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):   # ValueError: an empty file cannot be mapped
+            return False
+        if len(mapped) != sum(sizes):
+            mapped.close()
+            return False
+        self.mapped = mapped
+        buffer = memoryview(mapped).toreadonly()
+        self.tables = []
+        offset = 0
+        for table_size in sizes:
+            self.tables.append(buffer[offset:offset + table_size])
+            offset += table_size
+        return True
+
+    # Description: Builds the table for one group with a breadth first search backwards from every goal
+    # (every move can be undone, so the same moves are used). Moves of X cost 0 unless count_x is set, so
+    # moves are never counted twice across tables (a 0-1 breadth first search handles the free moves).
+    # Arguments: Group: list of vehicle names (X first), Radixes: list of int, Count X moves: bool
+    # Returns: Table: bytes
+    def build_table(self, group, radixes, count_x):
+        vehicles = [self.vehicles[name] for name in group]
+        table = bytearray([self.UNSOLVABLE]) * product(radixes)
+        to_visit = deque()
+        car = vehicles[0]
+        if car.orientation == 'horizontal' and car.pos[0] == self.exit_row:
+            for coords in all_coords(radixes):
+                if coords[0] == self.exit_col - car.length + 1 and self.tiles(vehicles, coords) is not None:
+                    table[mixed_radix_index(coords, radixes)] = 0
+                    to_visit.append(coords)
+        while to_visit:
+            coords = to_visit.popleft()
+            distance = table[mixed_radix_index(coords, radixes)]
+            occupied = self.tiles(vehicles, coords)
+            for i, vehicle in enumerate(vehicles):
+                cost = 1 if i > 0 or count_x else 0
+                for step in (-1, 1):
+                    coord = coords[i] + step
+                    if coord < 0 or coord >= radixes[i]:
+                        continue
+                    if vehicle.orientation == 'vertical':
+                        tile = (coord if step < 0 else coord + vehicle.length - 1, vehicle.pos[1])
+                    else:
+                        tile = (vehicle.pos[0], coord if step < 0 else coord + vehicle.length - 1)
+                    if tile in occupied:
+                        continue
+                    next_coords = coords[:i] + (coord,) + coords[i + 1:]
+                    index = mixed_radix_index(next_coords, radixes)
+                    if distance + cost < table[index]:
+                        table[index] = distance + cost
+                        if cost == 0:
+                            to_visit.appendleft(next_coords)
+                        else:
+                            to_visit.append(next_coords)
+        return bytes(table)
+
+    # Description: Finds the tiles covered by vehicles at the given coordinates
+    # Arguments: Vehicles: list of objects, Coordinates: tuple
+    # Returns: Tiles: set, or None if two vehicles overlap
+    def tiles(self, vehicles, coords):
+        occupied = set()
+        for vehicle, coord in zip(vehicles, coords):
+            for i in range(vehicle.length):
+                if vehicle.orientation == 'vertical':
+                    tile = (coord + i, vehicle.pos[1])
+                else:
+                    tile = (vehicle.pos[0], coord + i)
+                if tile in occupied:
+                    return None
+                occupied.add(tile)
+        return occupied
+
+    # Description: Adds up the table distances for a board
+    # Arguments: Board: object
+    # Returns: Distance: int (UNSOLVABLE if a table has no path to the goal)
+    def distance(self, board):
+        coords = {vehicle.name: vehicle.pos[0] if vehicle.orientation == 'vertical' else vehicle.pos[1]
+                  for vehicle in board.vehicle_list}
+        total = 0
+        for group, radixes, table in zip(self.groups, self.radixes, self.tables):
+            distance = table[mixed_radix_index([coords[name] for name in group], radixes)]
+            if distance == self.UNSOLVABLE:
+                return self.UNSOLVABLE
+            total += distance
+        return total
+
+
+# Description: Multiplies a list of numbers
+# Arguments: Numbers: list of int
+# Returns: Product: int
+def product(numbers):
+    result = 1
+    for number in numbers:
+        result *= number
+    return result
+
+
+# Description: Turns coordinates into an index of a flat table, each coordinate being a digit in its radix
+# Arguments: Coordinates: sequence of int, Radixes: list of int
+# Returns: Index: int
+def mixed_radix_index(coords, radixes):
+    index = 0
+    for coord, radix in zip(coords, radixes):
+        index = index * radix + coord
+    return index
+
 
+# Description: Generates every combination of coordinates for the given radixes
+# Arguments: Radixes: list of int
+# Returns: Generator of coordinate tuples
+def all_coords(radixes):
+    if not radixes:
+        yield ()
+        return
+    for coord in range(radixes[0]):
+        for rest in all_coords(radixes[1:]):
+            yield (coord,) + rest
 
 
 # Description: Traverses through the start state and converts all the vehicle characters
 # into vehicle objects to be added to the board. Having a board object that holds a list
 # of vehicle objects allows for better representation and operation of each state.
+# The board's size is taken from the start state, and the exit is set to exit_pos if given.
+# Raises ValueError if the exit is not a tile of the right edge (the edge X drives toward), or if X is not
+# a horizontal car in the exit row, left of the exit column.
 # The board's heuristic is calculated at the end depending on the user's input.
-# Arguments: Start state: string, Board: object, Depth: int
+# Arguments: Start state: string, Board: object, Depth: int, Exit position: (row, column) tuple or None
 # Returns: None
-def create_all_vehicles(start, board, depth):
+def create_all_vehicles(start, board, depth, exit_pos=None):
     vehicle_list = []
     vehicle_dict = {}
 
+    board.size = len(start)
+    board.grid = ['-' * board.size] * board.size
+    if exit_pos is None:
+        exit_pos = ((board.size - 1) // 2, board.size - 1)
+    board.exit_row, board.exit_col = exit_pos
+    if not 0 <= board.exit_row < board.size or board.exit_col != board.size - 1:
+        raise ValueError("the exit must be on the right edge of the board: row 0 to " + str(board.size - 1) +
+                         ", column " + str(board.size - 1))
+
     for x, row in enumerate(start):
         for y, tile in enumerate(row):
             if tile != '-':
@@ -397,15 +1476,19 @@ def create_all_vehicles(start, board, depth):
                     vehicle_dict[tile].incr_length()
                 else:                       # create a new obj and add to the list
                     orientation = check_orientation(start, x, y)
-                    car = Vehicle(tile, orientation, 1, (x, y))
+                    car = Vehicle(tile, orientation, 1, (x, y), board.size)
                     vehicle_list.append(car)
                     vehicle_dict[tile] = car
+    car = vehicle_dict.get('X')     # the search and heuristics need X to be able to drive right to the exit
+    if car is None or car.orientation != 'horizontal':
+        raise ValueError("the start state needs a horizontal X car")
+    if car.pos[0] != board.exit_row or car.pos[1] + car.length - 1 > board.exit_col:
+        raise ValueError("the X car must be in the exit row (" + str(board.exit_row) +
+                         ") and left of the exit column (" + str(board.exit_col) + ")")
     for vehicle in vehicle_list:
         board.add_vehicle(vehicle)
-    if board.heuristic_to_use == 0:
-        board.priority = blocking_heuristic(board, depth)
-    else:
-        board.priority = custom_heuristic(board, depth)
+    board.depth = depth
+    board.calculate_priority()
 
 
 # Description: Checks the orientation of a vehicle given the first encountered position.
@@ -413,22 +1496,92 @@ def create_all_vehicles(start, board, depth):
 # Returns: Orientation name: string
 def check_orientation(state, x, y):
     # If the next adjacent tile is of the same letter, then the vehicle is horizontal, else vertical
-    if y <= 4 and state[x][y] == state[x][y + 1]:
+    if y + 1 < len(state[x]) and state[x][y] == state[x][y + 1]:
         return "horizontal"
     else:
         return "vertical"
 
 
-# Description: Check if a given board state is equal to the goal state
+# Description: Check if a given board state is equal to the goal state (X covers the exit tile)
 # Arguments: Board: object
 # Returns: True if the board is a goal state, else False
 def is_goal_state(board):
-    if board.is_occupied((2,4)) == 'X' and board.is_occupied((2,5)) == 'X':
+    if (board.is_occupied((board.exit_row, board.exit_col)) == 'X' and
+            board.is_occupied((board.exit_row, board.exit_col - 1)) == 'X'):
         return True
     else:
         return False
 
 
+# Description: Checks if nothing blocks the X car from the exit. If so, X is driven right one tile at a
+# time until it reaches the exit, and the boards are linked to the given board like generated children.
+# Arguments: Board: object
+# Returns: Goal state: object, or None if X is blocked
+def clear_path_to_goal(board):
+    car = board.get_vehicle('X')
+    if car.orientation != 'horizontal' or car.pos[0] != board.exit_row:
+        return None
+    for y in range(car.pos[1] + car.length, board.exit_col + 1):
+        if board.is_occupied((board.exit_row, y)) != '-':
+            return None
+
+    index = board.vehicle_list.index(car)
+    state = board
+    while not is_goal_state(state):
+        new_board = state.copy_self()
+        new_board.parent = state
+        state.child = new_board
+        new_board.incr_depth()
+        new_board.move_vehicle(index, 'right')
+        new_board.calculate_priority()
+        state = new_board
+    return state
+
+
+# Description: Counts the moves X still needs to drive to the exit (one per tile)
+# Arguments: Board: object
+# Returns: Moves: int
+def remaining_drive(board):
+    car = board.get_vehicle('X')
+    return board.exit_col - (car.pos[1] + car.length - 1)
+
+
+# Description: Gives the smallest priority among the frontier and the given priority. A goal that costs no
+# more than this is a cheapest solution, as long as the heuristic does not overestimate.
+# Arguments: Frontier: PriorityQueue, Priority: int
+# Returns: Priority: int
+def lowest_priority(frontier, priority):
+    if frontier.queue:                  # the heap keeps the smallest board first
+        return min(priority, frontier.queue[0].priority)
+    return priority
+
+
+# Description: Prints out the path from the start state to a goal state
+# Arguments: Goal state: object, Explored states: list, Memory tracker: object
+# Returns: Path: list
+def print_solution(goal_state, explored_states, memory):
+    path = trace_path(goal_state)
+    for state in path:
+        state.print_state()
+    print("Total moves: ", len(path) - 1)
+    print("Total states explored: ", len(explored_states) + memory.dropped_states)
+    memory.print_usage()
+    return path
+
+
+# Description: Approximates the memory used by one generated board: the board object, its grid list and
+# vehicle list, and what its move made new (one vehicle object and at most two grid rows). The other
+# vehicles and rows are shared with the parent board (see copy_self).
+# Arguments: Board: object
+# Returns: Size in bytes: int
+def estimate_board_bytes(board):
+    size = sys.getsizeof(board) + sys.getsizeof(board.__dict__) + sys.getsizeof(board.grid)
+    size += sys.getsizeof(board.vehicle_list) + 2 * sys.getsizeof(board.grid[0])
+    vehicle = board.vehicle_list[0]
+    size += sys.getsizeof(vehicle) + sys.getsizeof(vehicle.__dict__) + sys.getsizeof(vehicle.pos)
+    return size
+
+
 # Description: Traces a path from a node to the root. Adds the nodes to a list and
 # reverses it so the first item in the list starts with the root. This is used to print
 # out the states from start to goal.
@@ -444,4 +1597,307 @@ def trace_path(goal_state):
     return path
 
 
+# Description: Packs a solution path (as returned by trace_path) into one byte per move. Unit moves of the
+# same vehicle in the same direction are merged into one move. Each move holds the vehicle index (vehicles
+# sorted by name) in the high bits, the direction in bit 3 (1 for down/right) and the distance in bits 0-2.
+# Boards with up to 16 vehicles use one byte per move (4 index bits); boards with more use two bytes per
+# move, big endian (12 index bits), see move_width.
+# Arguments: Path: list of boards
+# Returns: Moves: bytes
+def encode_solution(path):
+    moves = []
+    for prev_state, state in zip(path, path[1:]):
+        prev_key, key = table_key(prev_state), table_key(state)
+        for index in range(len(key)):
+            if key[index] != prev_key[index]:
+                direction = 1 if key[index] > prev_key[index] else 0
+                distance = abs(key[index] - prev_key[index])
+                if moves and moves[-1] >> 3 == index << 1 | direction and (moves[-1] & 7) + distance <= 7:
+                    moves[-1] += distance               # same vehicle and direction as the last move
+                else:
+                    moves.append(index << 4 | direction << 3 | distance)
+    width = move_width(len(path[0].vehicle_list)) if path else 1
+    return b''.join(move.to_bytes(width, 'big') for move in moves)
+
+
+# Description: Finds the number of bytes per packed move for a number of vehicles
+# Arguments: Number of vehicles: int
+# Returns: Bytes per move: int
+def move_width(vehicle_count):
+    if vehicle_count <= 16:
+        return 1
+    if vehicle_count <= 4096:
+        return 2
+    raise ValueError("packed moves only have room for 4096 vehicles")
+
+
+# Description: Replays packed moves from a start board, making each board only when it is asked for.
+# One board is yielded per packed move, i.e. per slide of one or more tiles, not per unit move, so the
+# boards can be fewer than the moves trace_path reports.
+# Arguments: Start board: object, Moves: bytes (see encode_solution)
+# Returns: Generator of boards, starting with a copy of the start board
+def replay_solution(start_board, moves):
+    board = start_board.copy_self()
+    board.depth = 0
+    yield board
+    by_name = sorted(range(len(board.vehicle_list)), key=lambda i: board.vehicle_list[i].name)
+    width = move_width(len(by_name))
+    for i in range(0, len(moves), width):
+        move = int.from_bytes(moves[i:i + width], 'big')
+        index = by_name[move >> 4]
+        vehicle = board.vehicle_list[index]
+        if vehicle.orientation == 'vertical':
+            movement = 'down' if move & 8 else 'up'
+        else:
+            movement = 'right' if move & 8 else 'left'
+        new_board = board.copy_self()
+        new_board.parent = board
+        new_board.incr_depth()
+        for step in range(move & 7):
+            new_board.move_vehicle(index, movement)
+        board = new_board
+        yield board
+
+
+# Description: Makes the key a start board is stored under in a SolutionStore: the exit position
+# followed by the occupancy grid
+# Arguments: Board: object
+# Returns: Key: bytes
+def solution_key(board):
+    return (str(board.exit_row) + ',' + str(board.exit_col) + ':' + ''.join(board.grid)).encode()
+
+
+# Solution Store Class
+# Description: Append-only file of packed solutions, looked up by canonical start state (the exit and the
+# occupancy grid, which do not depend on vehicle parse order, see solution_key). Each record is the length
+# of the start state and the length of the packed moves (2 bytes each), the start state and the moves
+# from encode_solution. New records are only ever appended.
+# The start states are found through a sidecar index file (path + '.idx'): a header record with the number
+# of store bytes it covers, then one record per solution (an 8 byte hash of the start state and the offset
+# of the solution's record), sorted and memory-mapped, so a lookup is a binary search and opening the store
+# reads nothing but the records the index does not cover yet (scanned in SCAN_CHUNK byte chunks).
+# Records added since the index was last written are kept in memory (at most PENDING_LIMIT of them) and
+# merged into the index when it fills up and on close(). The store can be used in a with statement.
+# Arguments: Path: string
+class SolutionStore:
+    RECORD_HEADER = struct.Struct('<HH')
+    INDEX_RECORD = 16           # bytes per index record: start state hash (8), record offset (8, big endian)
+    SCAN_CHUNK = 1024 * 1024    # bytes read at a time when scanning records the index does not cover
+    PENDING_LIMIT = 100000      # records kept in memory before they are merged into the index
+    CHUNK_RECORDS = 4096        # index records read or written at a time
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.index_map = None
+        self.index_count = 0
+        self.pending = {}               # start state: offset of its record, for records not in the index
+        self.file = open(path, 'ab+')
+        covered = self.open_index()
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() > covered:  # written after the index, or there is no index yet
+            self.scan(covered)
+
+    # Description: Memory-maps the index file if it matches the store
+    # Returns: Bytes of the store the index covers: int (0 if there is no usable index)
+    def open_index(self):
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        self.index_count = 0
+        if not os.path.exists(self.index_path) or os.path.getsize(self.index_path) < self.INDEX_RECORD:
+            return 0
+        with open(self.index_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        covered = int.from_bytes(mapped[:self.INDEX_RECORD], 'big')
+        self.file.seek(0, os.SEEK_END)
+        if covered > self.file.tell():  # the store was replaced or cut short, the index is stale
+            mapped.close()
+            return 0
+        self.index_map = mapped
+        self.index_count = len(mapped) // self.INDEX_RECORD - 1
+        return covered
+
+    # Description: Indexes the records from a file offset to the end of the store, reading SCAN_CHUNK bytes
+    # at a time, and cuts off a record that was only partly written
+    # Arguments: Offset: int
+    def scan(self, offset):
+        work_dir = tempfile.mkdtemp(prefix='rushhour_store_', dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            runs = []
+            entries = []
+            data = b''
+            self.file.seek(offset)
+            while True:
+                chunk = self.file.read(self.SCAN_CHUNK)
+                if not chunk:
+                    break
+                data += chunk
+                pos = 0
+                while pos + self.RECORD_HEADER.size <= len(data):
+                    start_length, length = self.RECORD_HEADER.unpack_from(data, pos)
+                    start = pos + self.RECORD_HEADER.size
+                    if start + start_length + length > len(data):   # record continues in the next chunk
+                        break
+                    entries.append(self.index_record(data[start:start + start_length], offset + pos))
+                    pos = start + start_length + length
+                offset += pos
+                data = data[pos:]
+                if len(entries) >= self.PENDING_LIMIT:
+                    runs.append(self.write_entries(work_dir, len(runs), entries))
+                    entries = []
+            if data:                    # partly written record at the end of the file
+                self.file.truncate(offset)
+            if entries:
+                runs.append(self.write_entries(work_dir, len(runs), entries))
+            self.write_index(work_dir, runs, offset)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Description: Sorts index records and writes them out as a run file
+    # Arguments: Work directory: string, Run name: int, Index records: list of bytes
+    # Returns: Path of the run file: string
+    def write_entries(self, work_dir, run_name, entries):
+        return write_run(work_dir, run_name, entries, self.INDEX_RECORD, self.CHUNK_RECORDS)
+
+    # Description: Merges sorted runs of index records with the current index into a new index file
+    # Arguments: Work directory: string, Runs: list of paths, Bytes of the store covered: int
+    def write_index(self, work_dir, runs, covered):
+        runs = merge_runs(work_dir, runs, self.INDEX_RECORD, self.CHUNK_RECORDS)
+        sources = [read_records(run, self.INDEX_RECORD, self.CHUNK_RECORDS) for run in runs]
+        if self.index_map is not None:
+            old_index = read_records(self.index_path, self.INDEX_RECORD, self.CHUNK_RECORDS)
+            next(old_index)             # skip the header record
+            sources.append(old_index)
+        records = heapq.merge(*sources)
+        header = [covered.to_bytes(self.INDEX_RECORD, 'big')]
+        new_path = os.path.join(work_dir, 'index')
+        write_records(new_path, (record for part in (header, records) for record in part),
+                      self.INDEX_RECORD, self.CHUNK_RECORDS)
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        os.replace(new_path, self.index_path)
+        self.open_index()
+
+    # Description: Merges the records added since the index was last written into the index
+    def flush_index(self):
+        if not self.pending:
+            return
+        work_dir = tempfile.mkdtemp(prefix='rushhour_store_', dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            entries = [self.index_record(start, offset) for start, offset in self.pending.items()]
+            run = self.write_entries(work_dir, 0, entries)
+            self.file.seek(0, os.SEEK_END)
+            self.write_index(work_dir, [run], self.file.tell())
+            self.pending = {}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    # Description: Makes the index record of a start state: its hash, then the offset of its record
+    # Arguments: Start state: bytes (from solution_key), Record offset: int
+    # Returns: Index record: bytes
+    def index_record(self, start, offset):
+        return hashlib.blake2b(start, digest_size=8).digest() + offset.to_bytes(8, 'big')
+
+    # Description: Finds the record of a start state, checking the pending records and then every index
+    # record with the same hash (latest first, so a start state added again gives its latest solution)
+    # Arguments: Start state: bytes (from solution_key)
+    # Returns: (offset of the moves, length of the moves), or None if the start state is not in the store
+    def find(self, start):
+        offsets = []
+        if start in self.pending:
+            offsets.append(self.pending[start])
+        if self.index_map is not None:
+            digest = hashlib.blake2b(start, digest_size=8).digest()
+            index = bisect_left(range(self.index_count), digest, key=self.index_digest)
+            matches = []
+            while index < self.index_count and self.index_digest(index) == digest:
+                record = (index + 1) * self.INDEX_RECORD
+                matches.append(int.from_bytes(self.index_map[record + 8:record + self.INDEX_RECORD], 'big'))
+                index += 1
+            offsets += reversed(matches)
+        for offset in offsets:
+            self.file.seek(offset)
+            start_length, length = self.RECORD_HEADER.unpack(self.file.read(self.RECORD_HEADER.size))
+            if self.file.read(start_length) == start:  # another start state can have the same hash
+                return offset + self.RECORD_HEADER.size + start_length, length
+        return None
+
+    # Description: Returns the start state hash of an index record (used by the binary search)
+    # Arguments: Index: int
+    # Returns: Hash: bytes
+    def index_digest(self, index):
+        record = (index + 1) * self.INDEX_RECORD
+        return self.index_map[record:record + 8]
+
+    # Description: Appends the solutions of many puzzles with a single write. Raises ValueError, before
+    # anything is written, if a path is empty (best_first_search returns [] for an unsolvable puzzle, which
+    # has no start state to store the solution under).
+    # Arguments: Paths: iterable of paths from trace_path
+    def add_many(self, paths):
+        paths = list(paths)
+        if not all(paths):
+            raise ValueError("cannot store an empty path: the puzzle has no solution")
+        self.file.seek(0, os.SEEK_END)
+        offset = self.file.tell()
+        chunk = bytearray()
+        for path in paths:
+            start = solution_key(path[0])
+            moves = encode_solution(path)
+            self.pending[start] = offset + len(chunk)
+            chunk += self.RECORD_HEADER.pack(len(start), len(moves)) + start + moves
+        self.file.write(chunk)
+        self.file.flush()
+        if len(self.pending) >= self.PENDING_LIMIT:
+            self.flush_index()
+
+    # Description: Appends the solution of one puzzle
+    # Arguments: Path: list of boards from trace_path
+    def add(self, path):
+        self.add_many([path])
+
+    # Description: Reads the packed moves stored for a start board
+    # Arguments: Start board: object
+    # Returns: Moves: bytes, or None if the start state is not in the store
+    def get(self, start_board):
+        record = self.find(solution_key(start_board))
+        if record is None:
+            return None
+        self.file.seek(record[0])
+        return self.file.read(record[1])
+
+    # Description: Replays the solution stored for a start board
+    # Arguments: Start board: object
+    # Returns: Generator of boards, or None if the start state is not in the store
+    def replay(self, start_board):
+        moves = self.get(start_board)
+        if moves is None:
+            return None
+        return replay_solution(start_board, moves)
+
+    def __contains__(self, start_board):
+        return self.find(solution_key(start_board)) is not None
+
+    # Description: Number of records in the index plus the start states added since it was written (a start
+    # state added again after the index was written counts twice)
+    def __len__(self):
+        return self.index_count + len(self.pending)
+
+    # Description: Writes the pending records to the index and closes the files
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush_index()
+        if self.index_map is not None:
+            self.index_map.close()
+            self.index_map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 # Dustin Cai 5/1/2020
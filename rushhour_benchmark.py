@@ -0,0 +1,175 @@
+import contextlib
+import io
+import random
+import sys
+import threading
+import time
+
+import rushhour
+
+# Benchmark for how the search scales with board size (6x6, 8x8, 10x10).
+# Every size is run on the puzzles in PUZZLES, which all take MIN_MOVES to MAX_MOVES moves to clear X's path,
+# so the sizes are compared on puzzles of about the same difficulty. They were picked by pick_puzzles from
+# random puzzles made with SEED; run with the argument `pick` to pick them again instead. Each puzzle is
+# solved with best_first_search once per heuristic in HEURISTICS and the moves, states explored, peak states
+# in memory, time and nodes per second are printed. The cost of one move (copy the board and move a vehicle)
+# is also timed for each size.
+# Note: best_first_search keeps explored states and the frontier in lists, so the duplicate checks cost
+# O(states) per child and nodes per second falls as the search grows, whatever the board size.
+
+SIZES = [6, 8, 10]
+SEED = 2020
+PUZZLES_PER_SIZE = 3
+MIN_MOVES = 5                   # range of moves needed to clear X's path in the kept puzzles
+MAX_MOVES = 6
+BFS_LIMIT = 20000               # most states the breadth first search may visit to check a puzzle
+TIME_LIMIT = 60                 # seconds before a search is cancelled
+HEURISTICS = [0, 1, 2]          # blocking, custom and pattern database heuristics
+
+# (start state, moves to clear X's path) for each size, from pick_puzzles with SEED
+PUZZLES = {
+    6: [(['-----H', '---CCH', 'XXE--H', 'AAEFFF', '-DBB--', '-DGG--'], 6),
+        (['-E----', '-E-HHH', 'XX-G--', '---G-B', 'C-DDDB', 'CFF-AA'], 6),
+        (['FF----', '--AAAC', 'XX--DC', '----DC', '-EEB--', '---BGG'], 5)],
+    8: [(['------G-', '-J----G-', '-J-C-IG-', 'XX-CKI-L', 'HHHCK--L', '--FM-NAA', '--FMBN--', 'EE--BDD-'], 6),
+        (['AAA--K--', '---H-K--', '-IIHGN--', 'XXD-GN--', 'M-DCC---', 'MEEE---L', 'F---JBBL', 'F---J---'], 6),
+        (['IILL-A--', '--F--A-B', '--FKKA-B', 'XX-D--GB', '---D-HG-', '---D-HG-', '------JJ', '-EEECCC-'], 5)],
+    10: [(['------GG--', '----RRSSSJ', '--KKK-DDAJ', '---FFOO-A-', 'XX--QUC---',
+           '----QUCEE-', '--MMNULHHH', '-T--N-L-PP', '-T--N-L-II', 'BB--------'], 5),
+         (['---FF--GG-', '---IT-----', '---IT-NCCS', '--J-TDNLLS', 'XXJ--D-H--',
+           '--J--D-H--', '--UUA-----', 'O---A-R-E-', 'OMMBBBRPEK', 'OQQQ---PEK'], 5),
+         (['-CC-E--PPP', 'JJJ-E-NNI-', '-DDD----I-', '-SSSOKK-L-', 'XX--O---L-',
+           'RGGM---BBB', 'R--M---T--', '---M-FFT--', 'H---------', 'HAAAQQQ---'], 5)],
+}
+
+
+# Description: Makes a random puzzle: X in the exit row at the left edge, then random vehicles of
+# length 2 or 3 placed on empty tiles until the board is about `density` full
+# Arguments: Size: int, Random number generator: Random, Density: float
+# Returns: Start state: list of strings
+def random_puzzle(size, rng, density=0.5):
+    grid = [['-'] * size for i in range(size)]
+    exit_row = (size - 1) // 2
+    grid[exit_row][0] = grid[exit_row][1] = 'X'
+    names = [chr(c) for c in range(ord('A'), ord('Z') + 1) if chr(c) != 'X']
+    filled = 2
+    tries = 0
+    while names and filled < density * size * size and tries < 1000:
+        tries += 1
+        length = rng.choice([2, 2, 3])
+        vertical = rng.random() < 0.5
+        x = rng.randrange(size - (length - 1 if vertical else 0))
+        y = rng.randrange(size - (0 if vertical else length - 1))
+        tiles = [(x + i, y) if vertical else (x, y + i) for i in range(length)]
+        if not vertical and x == exit_row:  # a horizontal car in the exit row makes the puzzle unsolvable
+            continue
+        if any(grid[i][j] != '-' for i, j in tiles):
+            continue
+        name = names.pop(0)
+        for i, j in tiles:
+            grid[i][j] = name
+        filled += length
+    return [''.join(row) for row in grid]
+
+
+# Description: Finds the fewest moves until X has a clear path to the exit, with a breadth first search over
+# packed encodings. X then drives straight out, which takes longer on a bigger board without making the
+# puzzle any harder, so those last moves are not counted.
+# Arguments: Start state: list of strings, Limit: int (most states to visit)
+# Returns: Moves: int, or None if unsolvable or the limit was reached
+def unblock_moves(start, limit=BFS_LIMIT):
+    board = rushhour.Board(0)
+    rushhour.create_all_vehicles(start, board, 0)
+    if rushhour.clear_path_to_goal(board) is not None:
+        return 0
+    car = board.get_vehicle('X')               # load_encoding moves the same vehicle objects
+    seen = {board.encode_state()}
+    layer = list(seen)
+    depth = 0
+    while layer and len(seen) < limit:
+        depth += 1
+        next_layer = []
+        for encoding in layer:
+            board.load_encoding(encoding)
+            for child in board.neighbor_encodings():
+                if child not in seen:
+                    seen.add(child)
+                    next_layer.append(child)
+        for encoding in next_layer:
+            board.load_encoding(encoding)
+            if set(board.grid[board.exit_row][car.pos[1] + car.length:board.exit_col + 1]) <= {'-'}:
+                return depth
+        layer = next_layer
+    return None
+
+
+# Description: Picks puzzles of a given size that take MIN_MOVES to MAX_MOVES moves to clear X's path
+# Arguments: Size: int, Random number generator: Random
+# Returns: List of (start state, moves to clear X's path)
+def pick_puzzles(size, rng):
+    puzzles = []
+    while len(puzzles) < PUZZLES_PER_SIZE:
+        start = random_puzzle(size, rng)
+        moves = unblock_moves(start)
+        if moves is not None and MIN_MOVES <= moves <= MAX_MOVES:
+            puzzles.append((start, moves))
+    return puzzles
+
+
+# Description: Times copying a board and moving one vehicle, averaged over many moves
+# Arguments: Start state: list of strings, Repeats: int
+# Returns: Microseconds per move: float
+def time_per_move(start, repeats=2000):
+    board = rushhour.Board(0)
+    rushhour.create_all_vehicles(start, board, 0)
+    moves = [(index, movement) for index, vehicle in enumerate(board.vehicle_list)
+             for movement in board.legal_movements(vehicle)]
+    begin = time.perf_counter()
+    for i in range(repeats):
+        index, movement = moves[i % len(moves)]
+        new_board = board.copy_self()
+        new_board.move_vehicle(index, movement)
+    return (time.perf_counter() - begin) / repeats * 1e6
+
+
+# Description: Solves a puzzle with best_first_search, cancelling it after TIME_LIMIT seconds. Pattern
+# database tables are built (or loaded) before the clock starts.
+# Arguments: Heuristic: int, Start state: list of strings
+# Returns: Moves (or 'cancelled' or 'no solution'), states expanded, peak states in memory, seconds
+def solve(heuristic, start):
+    if heuristic == 2:
+        board = rushhour.Board(heuristic)
+        rushhour.create_all_vehicles(start, board, 0)
+        rushhour.PatternDatabase.for_board(board)
+    cancel = threading.Event()
+    timer = threading.Timer(TIME_LIMIT, cancel.set)
+    snapshots = []
+    monitor = rushhour.ProgressMonitor(callback=snapshots.append, interval=TIME_LIMIT, cancel=cancel)
+    timer.start()
+    begin = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        path, memory = rushhour.best_first_search(heuristic, start, monitor=monitor)
+    seconds = time.perf_counter() - begin
+    timer.cancel()
+    if path is None:                # only a cancelled search returns None
+        moves = 'cancelled'
+    elif not path:
+        moves = 'no solution'
+    else:
+        moves = len(path) - 1
+    return moves, snapshots[-1]['expanded'], memory.peak_nodes, seconds
+
+
+if __name__ == '__main__':
+    rng = random.Random(SEED)
+    print("size  vehicles  unblock  h        moves  explored   peak  seconds  nodes/s  us/move")
+    for size in SIZES:
+        puzzles = pick_puzzles(size, rng) if sys.argv[1:] == ['pick'] else PUZZLES[size]
+        for start, unblock in puzzles:
+            vehicles = len(set(''.join(start))) - 1
+            for heuristic in HEURISTICS:
+                moves, explored, peak, seconds = solve(heuristic, start)
+                rate = explored / seconds
+                print("%4d  %8d  %7d  %d  %11s  %8d  %5d  %7.2f  %7.0f  %7.1f"
+                      % (size, vehicles, unblock, heuristic, moves, explored, peak, seconds, rate,
+                         time_per_move(start)))
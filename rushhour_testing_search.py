@@ -0,0 +1,128 @@
+import contextlib
+import io
+
+import rushhour
+
+# 6x6 puzzles with their shortest solution (the samples from rushhour_testing_bottleneck.py, then random ones)
+SOLVABLE = [(["--AABB", "--CDEF", "XXCDEF", "--GGHH", "------", "------"], 16),
+            (["AKKI--", "A--I--", "XXO---", "--OPPP", "--O--D", "--QQQD"], 22),
+            (["--BC--", "--BC-T", "XXBC-T", "--AA--", "------", "------"], 13),
+            (["--B-CC", "--BAAG", "XXB--G", "-DDHH-", "-III--", "-EE-FF"], 13),
+            (["B-A--F", "B-A-IF", "XXA-I-", "---EEC", "--DDDC", "-GG-HH"], 15),
+            (["---CC-", "----F-", "XXE-F-", "H-EDDD", "HGGIII", "-BBAA-"], 10)]
+# random 6x6 puzzles where X can never reach the exit
+UNSOLVABLE = [["-FBBA-", "-FCGAE", "XXCGAE", "--C--H", "--DD-H", "-III-H"],
+              ["-E-DC-", "-E-DCB", "XX-F-B", "GGAF-B", "-IAF--", "-IHH--"],
+              ["---H--", "---H-D", "XXAB-D", "IIABCD", "FG-EC-", "FG-EC-"]]
+HEURISTICS = [0, 2]     # the admissible heuristics (1 can overestimate, so its solutions can be longer)
+
+
+# Progress Monitor that records every state expanded for the first time (not the states put back by
+# partial expansion) as its occupancy grid, depth and priority
+class RecordingMonitor(rushhour.ProgressMonitor):
+    def __init__(self):
+        super().__init__()
+        self.states = []
+
+    def expanded(self, state, frontier_size):
+        if state.expanded_f is None:
+            self.states.append((''.join(state.grid), state.depth, state.priority))
+        return super().expanded(state, frontier_size)
+
+
+# Description: Runs best_first_search without printing the boards
+# Arguments: Heuristic: int, Start state: list of strings, Partial expansion: bool
+# Returns: Path: list of boards, states expanded: list of (grid, depth, priority)
+def search(heuristic, start, partial_expansion):
+    monitor = RecordingMonitor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        path, memory = rushhour.best_first_search(heuristic, start, monitor=monitor,
+                                                  partial_expansion=partial_expansion)
+    return path, monitor.states
+
+# Checks for the search itself: the heuristics on boards where the real distance is known by hand, the
+# f-bound reported in progress snapshots, and best_first_search with and without partial expansion against
+# the exact lengths from build_distance_table and external_bfs on the puzzles in SOLVABLE. On the puzzles
+# in UNSOLVABLE every reachable board must be explored, which checks that the pruning of independent move
+# orders (Board.move_pruned) never cuts a board off.
+# Run the file directly; every check prints "ok" or stops with an AssertionError.
+
+
+# Description: Makes a board from a start state, with its priority calculated at depth 0
+# Arguments: Heuristic: int, Start state: list of strings
+# Returns: Board: object
+def make_board(heuristic, start):
+    board = rushhour.Board(heuristic)
+    rushhour.create_all_vehicles(start, board, 0)
+    return board
+
+
+# Description: Heuristics 0 and 1 on a 3 tile X: a clear row costs exactly X's drive (the priority of the
+# board equals the cost of the driven-out goal), a goal board costs 0, and X's own tiles are not blockers
+def test_long_car():
+    empty = ['------'] * 6
+    for heuristic in (0, 1):
+        board = make_board(heuristic, empty[:2] + ['XXX---'] + empty[3:])
+        assert board.priority == 3 == rushhour.clear_path_to_goal(board).depth
+        assert make_board(heuristic, empty[:2] + ['---XXX'] + empty[3:]).priority == 0
+        blocked = make_board(heuristic, empty[:1] + ['----A-', 'XXX-A-'] + empty[3:])
+        assert blocked.priority > 3    # A still counts, X's third tile does not
+    start = empty[:1] + ['----A-', 'XXX-A-'] + empty[3:]
+    board = make_board(0, start)
+    assert board.priority == rushhour.build_distance_table(start).distance(board) == 4   # A up, X 3 right
+    print("long car: ok")
+
+
+# Description: Progress snapshots report the f-bound the search has reached: it never goes down, it moves
+# off the root's f, and it ends at the solution's length (the heuristic is admissible)
+def test_progress_f():
+    snapshots = []
+    monitor = rushhour.ProgressMonitor(callback=snapshots.append, interval=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        path, memory = rushhour.best_first_search(0, SOLVABLE[0][0], monitor=monitor)
+    bounds = [snapshot['max_f'] for snapshot in snapshots]
+    assert bounds == sorted(bounds) and bounds[0] > snapshots[0]['best_f']
+    assert snapshots[-1]['max_f'] == len(path) - 1
+    print("progress f: ok")
+
+
+# Description: With an admissible heuristic, best_first_search finds a shortest solution with and without
+# partial expansion, and both expand the same states at the same depths below the solution's f (which of
+# the states tied at that f come out before the goal can differ). Partial expansion only matches plain A*
+# because frontier boards are moved onto shorter paths (decrease-key).
+def test_partial_expansion():
+    for start, moves in SOLVABLE:
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert rushhour.external_bfs(start) == moves
+        board = make_board(0, start)
+        assert rushhour.build_distance_table(start).distance(board) == moves
+        for heuristic in HEURISTICS:
+            path, states = search(heuristic, start, False)
+            partial_path, partial_states = search(heuristic, start, True)
+            assert len(path) - 1 == len(partial_path) - 1 == moves
+            below = sorted(state for state in states if state[2] < moves)
+            assert below == sorted(state for state in partial_states if state[2] < moves)
+            assert len(below) == len(set(below))    # no state expanded twice
+    print("partial expansion: ok")
+
+
+# Description: On an unsolvable puzzle the search explores every reachable board exactly once, whatever the
+# heuristic and with or without partial expansion. Move pruning is only safe because a frontier board
+# reached again by a different last move stops pruning (see Board.generate_new_states); without that, some
+# boards would never be reached.
+def test_unsolvable_complete():
+    for start in UNSOLVABLE:
+        reachable = rushhour.build_distance_table(start).count
+        for heuristic in (0, 1, 2):
+            for partial_expansion in (False, True):
+                path, states = search(heuristic, start, partial_expansion)
+                assert path == []
+                assert len(states) == len({state[0] for state in states}) == reachable
+    print("unsolvable complete: ok")
+
+
+if __name__ == '__main__':
+    test_long_car()
+    test_progress_f()
+    test_partial_expansion()
+    test_unsolvable_complete()
@@ -0,0 +1,159 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+
+import rushhour
+
+# Checks for the crash recovery of SolutionStore: reopening a store through its index, a record that was
+# only partly written when the process died (scan cuts it off), a deleted or stale index file (open_index
+# falls back to scanning the store), records added to an indexed store (flush_index merges them into the
+# index on close), a start state added again (the latest solution wins, before and after reopening) and an
+# empty path (what best_first_search returns for an unsolvable puzzle), which is refused.
+# Run the file directly; every check prints "ok" or stops with an AssertionError.
+
+PUZZLES = [["--AABB", "--CDEF", "XXCDEF", "--GGHH", "------", "------"],
+           ["AKKI--", "A--I--", "XXO---", "--OPPP", "--O--D", "--QQQD"],
+           ["--BC--", "--BC-T", "XXBC-T", "--AA--", "------", "------"]]
+
+
+# Description: Solves a puzzle with best_first_search without printing the boards
+# Arguments: Start state: list of strings
+# Returns: Path: list of boards
+def solve(start):
+    with contextlib.redirect_stdout(io.StringIO()):
+        path, memory = rushhour.best_first_search(0, start)
+    return path
+
+
+# Description: Solves a puzzle with a narrow beam search, which finds a different (longer) solution
+# Arguments: Start state: list of strings
+# Returns: Path: list of boards
+def solve_other(start):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rushhour.beam_search(0, start, beam_width=3)
+
+
+# Description: Checks that a store holds a path's solution and that replaying it reaches a goal
+# Arguments: Store: SolutionStore, Path: list of boards
+def check_stored(store, path):
+    assert path[0] in store
+    assert store.get(path[0]) == rushhour.encode_solution(path)
+    boards = list(store.replay(path[0]))
+    assert rushhour.is_goal_state(boards[-1])
+
+
+# Description: Closes a store's files without writing the pending records to the index, like a process
+# that died after its last add
+# Arguments: Store: SolutionStore
+def crash(store):
+    if store.index_map is not None:
+        store.index_map.close()
+    store.file.close()
+
+
+# Description: Reopening a closed store finds every solution through the index alone
+# Arguments: Store path: string, Paths: list of paths
+def test_reopen(path, paths):
+    with rushhour.SolutionStore(path) as store:
+        store.add_many(paths)
+    with rushhour.SolutionStore(path) as store:
+        assert store.index_count == len(paths) and not store.pending
+        for solution in paths:
+            check_stored(store, solution)
+    print("reopen: ok")
+
+
+# Description: A record cut short at the end of the store is dropped on reopen, and the records before it
+# (indexed or not) are kept
+# Arguments: Store path: string, Paths: list of paths
+def test_torn_tail(path, paths):
+    with rushhour.SolutionStore(path) as store:
+        store.add_many(paths[:2])
+    store = rushhour.SolutionStore(path)
+    store.add(paths[2])                     # not in the index yet
+    crash(store)
+    whole = os.path.getsize(path)
+    with open(path, 'ab') as f:             # header and half the start state of another record
+        f.write(rushhour.SolutionStore.RECORD_HEADER.pack(36, 20) + b'2,5:--AA')
+    with rushhour.SolutionStore(path) as store:
+        assert os.path.getsize(path) == whole
+        assert len(store) == len(paths)
+        for solution in paths:
+            check_stored(store, solution)
+    print("torn tail: ok")
+
+
+# Description: A deleted index is rebuilt by scanning the store, and an index that covers more than the
+# store holds (the store was cut short) is ignored
+# Arguments: Store path: string, Paths: list of paths
+def test_lost_index(path, paths):
+    with rushhour.SolutionStore(path) as store:
+        store.add_many(paths)
+    os.remove(path + '.idx')
+    with rushhour.SolutionStore(path) as store:
+        assert store.index_count == len(paths)
+        for solution in paths:
+            check_stored(store, solution)
+    assert os.path.exists(path + '.idx')
+
+    start = rushhour.solution_key(paths[1][0])
+    with rushhour.SolutionStore(path) as store:
+        second = store.find(start)[0] - len(start) - rushhour.SolutionStore.RECORD_HEADER.size
+    with open(path, 'r+b') as f:            # keep only the first record, the index still covers all three
+        f.truncate(second)
+    with rushhour.SolutionStore(path) as store:
+        assert store.index_count == 1
+        check_stored(store, paths[0])
+        assert paths[1][0] not in store and paths[2][0] not in store
+    print("lost index: ok")
+
+
+# Description: Records added to an indexed store are merged into the index on close, and a start state
+# added again gives its latest solution before and after reopening
+# Arguments: Store path: string, Paths: list of paths
+def test_add_again(path, paths):
+    with rushhour.SolutionStore(path) as store:
+        store.add_many(paths[:2])
+    other = solve_other(PUZZLES[0])
+    assert rushhour.encode_solution(other) != rushhour.encode_solution(paths[0])
+    with rushhour.SolutionStore(path) as store:
+        store.add_many([other, paths[2]])   # pending until close
+        assert len(store.pending) == 2
+        check_stored(store, other)
+    with rushhour.SolutionStore(path) as store:
+        assert store.index_count == 4 and not store.pending
+        check_stored(store, other)
+        check_stored(store, paths[1])
+        check_stored(store, paths[2])
+    print("add again: ok")
+
+
+# Description: The empty path best_first_search returns for an unsolvable puzzle raises ValueError, through
+# add and add_many, and nothing of its batch is written
+# Arguments: Store path: string, Paths: list of paths
+def test_empty_path(path, paths):
+    unsolvable = solve(["------", "------", "XX-AA-", "------", "------", "------"])
+    assert unsolvable == []
+    with rushhour.SolutionStore(path) as store:
+        for add in (lambda: store.add(unsolvable), lambda: store.add_many([paths[0], unsolvable])):
+            try:
+                add()
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("an empty path was stored")
+        assert len(store) == 0
+    assert os.path.getsize(path) == 0
+    print("empty path: ok")
+
+if __name__ == '__main__':
+    paths = [solve(start) for start in PUZZLES]
+    work_dir = tempfile.mkdtemp(prefix='rushhour_testing_store_')
+    try:
+        for i, test in enumerate([test_reopen, test_torn_tail, test_lost_index, test_add_again,
+                                      test_empty_path]):
+            test(os.path.join(work_dir, 'store' + str(i)), paths)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)